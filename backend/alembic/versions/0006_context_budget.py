@@ -0,0 +1,28 @@
+"""messages.token_count and models.default_num_ctx for context budgeting
+
+Revision ID: 0006_context_budget
+Revises: 0005_job_expected_bytes
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_context_budget"
+down_revision = "0005_job_expected_bytes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("messages", sa.Column("token_count", sa.Integer(), nullable=True))
+    op.add_column("models", sa.Column("default_num_ctx", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("models", "default_num_ctx")
+    op.drop_column("messages", "token_count")
@@ -0,0 +1,27 @@
+"""composite indexes for keyset pagination of chats and messages
+
+Revision ID: 0007_keyset_indexes
+Revises: 0006_context_budget
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0007_keyset_indexes"
+down_revision = "0006_context_budget"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_messages_chat_id_id", "messages", ["chat_id", "id"])
+    op.create_index("ix_chats_user_id_id", "chats", ["user_id", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chats_user_id_id", table_name="chats")
+    op.drop_index("ix_messages_chat_id_id", table_name="messages")
@@ -0,0 +1,29 @@
+"""model_download_jobs.priority for the download queue
+
+Revision ID: 0008_job_priority
+Revises: 0007_keyset_indexes
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_job_priority"
+down_revision = "0007_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "model_download_jobs",
+        sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("model_download_jobs", "priority")
@@ -0,0 +1,28 @@
+"""models.sha256 for download verification and the content-addressed blob store
+
+Revision ID: 0009_model_sha256
+Revises: 0008_job_priority
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_model_sha256"
+down_revision = "0008_job_priority"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("models", sa.Column("sha256", sa.String(length=64), nullable=True))
+    op.create_index("ix_models_sha256", "models", ["sha256"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_models_sha256", table_name="models")
+    op.drop_column("models", "sha256")
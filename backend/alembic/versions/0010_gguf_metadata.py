@@ -0,0 +1,34 @@
+"""GGUF header metadata on models
+
+Revision ID: 0010_gguf_metadata
+Revises: 0009_model_sha256
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_gguf_metadata"
+down_revision = "0009_model_sha256"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("models", sa.Column("architecture", sa.String(length=64), nullable=True))
+    op.add_column("models", sa.Column("context_length", sa.Integer(), nullable=True))
+    op.add_column("models", sa.Column("quantization", sa.String(length=32), nullable=True))
+    op.add_column("models", sa.Column("parameter_count", sa.BigInteger(), nullable=True))
+    op.add_column("models", sa.Column("chat_template", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("models", "chat_template")
+    op.drop_column("models", "parameter_count")
+    op.drop_column("models", "quantization")
+    op.drop_column("models", "context_length")
+    op.drop_column("models", "architecture")
@@ -0,0 +1,28 @@
+"""Stable history window start on chats, prompt eval count on messages
+
+Revision ID: 0011_prompt_prefix_reuse
+Revises: 0010_gguf_metadata
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011_prompt_prefix_reuse"
+down_revision = "0010_gguf_metadata"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chats", sa.Column("context_start_id", sa.Integer(), nullable=True))
+    op.add_column("messages", sa.Column("prompt_eval_count", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("messages", "prompt_eval_count")
+    op.drop_column("chats", "context_start_id")
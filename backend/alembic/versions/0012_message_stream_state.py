@@ -0,0 +1,34 @@
+"""Streaming state and timing of assistant messages
+
+Revision ID: 0012_message_stream_state
+Revises: 0011_prompt_prefix_reuse
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0012_message_stream_state"
+down_revision = "0011_prompt_prefix_reuse"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("messages", sa.Column("status", sa.String(length=16), nullable=True))
+    op.add_column("messages", sa.Column("ttft_ms", sa.Integer(), nullable=True))
+    op.add_column("messages", sa.Column("duration_ms", sa.Integer(), nullable=True))
+    op.add_column("messages", sa.Column("prompt_eval_ms", sa.Integer(), nullable=True))
+    op.add_column("messages", sa.Column("eval_ms", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("messages", "eval_ms")
+    op.drop_column("messages", "prompt_eval_ms")
+    op.drop_column("messages", "duration_ms")
+    op.drop_column("messages", "ttft_ms")
+    op.drop_column("messages", "status")
@@ -0,0 +1,70 @@
+"""local catalog of GGUF repos on the Hub
+
+Revision ID: 0013_hf_catalog
+Revises: 0012_message_stream_state
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0013_hf_catalog"
+down_revision = "0012_message_stream_state"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "catalog_repos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("repo_id", sa.String(length=255), nullable=False),
+        sa.Column("author", sa.String(length=128), nullable=True),
+        sa.Column("sha", sa.String(length=64), nullable=True),
+        sa.Column("downloads", sa.Integer(), nullable=False),
+        sa.Column("likes", sa.Integer(), nullable=False),
+        sa.Column("architecture", sa.String(length=64), nullable=True),
+        sa.Column("parameter_count", sa.BigInteger(), nullable=True),
+        sa.Column("context_length", sa.Integer(), nullable=True),
+        sa.Column("tags", sa.Text(), nullable=False),
+        sa.Column("search_text", sa.Text(), nullable=False),
+        sa.Column("last_modified", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint("repo_id", name="uq_catalog_repos_repo_id"),
+    )
+    op.create_index("ix_catalog_repos_downloads", "catalog_repos", ["downloads"])
+    op.create_index("ix_catalog_repos_architecture", "catalog_repos", ["architecture"])
+    op.create_table(
+        "catalog_files",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "repo_id", sa.Integer(), sa.ForeignKey("catalog_repos.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("filename", sa.String(length=512), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=True),
+        sa.Column("quantization", sa.String(length=32), nullable=True),
+    )
+    op.create_index("ix_catalog_files_repo_id", "catalog_files", ["repo_id"])
+    op.create_index("ix_catalog_files_quantization_size", "catalog_files", ["quantization", "size_bytes"])
+
+    dialect = op.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        op.execute("CREATE FULLTEXT INDEX ft_catalog_repos_search_text ON catalog_repos (search_text)")
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_repos_fts USING fts5("
+            "search_text, content='catalog_repos', content_rowid='id', tokenize='trigram')"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS catalog_repos_fts")
+    op.drop_index("ix_catalog_files_quantization_size", table_name="catalog_files")
+    op.drop_index("ix_catalog_files_repo_id", table_name="catalog_files")
+    op.drop_table("catalog_files")
+    op.drop_table("catalog_repos")
@@ -0,0 +1,25 @@
+"""(status, id) index for filtered pagination of download jobs
+
+Revision ID: 0014_job_status_index
+Revises: 0013_hf_catalog
+Create Date: 2026-10-16
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0014_job_status_index"
+down_revision = "0013_hf_catalog"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_model_download_jobs_status_id", "model_download_jobs", ["status", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_model_download_jobs_status_id", table_name="model_download_jobs")
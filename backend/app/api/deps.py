@@ -2,6 +2,8 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
+from app.core.auth_cache import cache_claims, cache_user, get_cached_claims, get_cached_user
+from app.core.config import settings
 from app.core.security import decode_token
 from app.db.models import User
 from app.db.session import get_db
@@ -10,18 +12,35 @@ from app.db.session import get_db
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+def _token_claims(token: str) -> tuple[dict, int]:
+    payload = get_cached_claims(token)
     try:
-        payload = decode_token(token)
+        if payload is None:
+            payload = decode_token(token)
+            cache_claims(token, payload)
         sub = payload.get("sub")
         if not sub:
             raise ValueError("missing sub")
-        user_id = int(sub)
+        return payload, int(sub)
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
+
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+    _, user_id = _token_claims(token)
+
+    user = get_cached_user(user_id)
+    if user is not None:
+        return user
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    return user
+    return cache_user(user)
+
 
+def get_token_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+    """Like get_current_user, but for read-only endpoints it may trust the signed claims (AUTH_TRUST_TOKEN_CLAIMS)."""
+    if not settings.auth_trust_token_claims:
+        return get_current_user(db, token)
+    payload, user_id = _token_claims(token)
+    return User(id=user_id, email=payload.get("email") or "")
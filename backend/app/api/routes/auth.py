@@ -1,40 +1,66 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_user
-from app.core.security import create_access_token, hash_password, verify_password
+from app.core.security import (
+    PasswordHasherBusyError,
+    create_access_token,
+    hash_password_async,
+    verify_password_async,
+)
 from app.db.models import User
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.schemas import LoginIn, TokenOut, UserCreate, UserOut
 
 router = APIRouter()
 
 
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts in progress, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=UserOut)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
-    existing = db.scalar(select(User).where(User.email == payload.email))
+async def register(payload: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(User).where(User.email == payload.email))
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    user = User(email=payload.email, password_hash=hash_password(payload.password))
+    try:
+        password_hash = await hash_password_async(payload.password)
+    except PasswordHasherBusyError:
+        raise _busy()
+    user = User(email=payload.email, password_hash=password_hash)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return UserOut(id=user.id, email=user.email, created_at=user.created_at)
 
 
 @router.post("/login", response_model=TokenOut)
-def login(payload: LoginIn, db: Session = Depends(get_db)):
-    user = db.scalar(select(User).where(User.email == payload.email))
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: LoginIn, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == payload.email))
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+    try:
+        ok, new_hash = await verify_password_async(payload.password, user.password_hash)
+    except PasswordHasherBusyError:
+        raise _busy()
+    if not ok:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made: upgrade it transparently.
+        user.password_hash = new_hash
+        await db.commit()
 
-    token = create_access_token(subject=str(user.id))
+    token = create_access_token(subject=str(user.id), claims={"email": user.email})
     return TokenOut(access_token=token)
 
 
 @router.get("/me", response_model=UserOut)
 def me(user: User = Depends(get_current_user)):
     return UserOut(id=user.id, email=user.email, created_at=user.created_at)
-
@@ -1,19 +1,54 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sse_starlette.sse import EventSourceResponse
-from sqlalchemy import asc, desc, select
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user
+from app.core.metrics import generation_queue_wait, generation_ttft, observe_generation_done
 from app.db.models import Chat, Message, Model, User
-from app.db.session import SessionLocal, get_db
-from app.schemas import ChatCreateIn, ChatDeleteIn, ChatDetailOut, ChatOut, MessageCreateIn, MessageOut, StreamParamsIn
-from app.services.ollama_client import chat_stream, ensure_model_in_ollama
+from app.db.session import get_async_db, get_db
+from app.schemas import (
+    ChatCreateIn,
+    ChatDeleteIn,
+    ChatDetailOut,
+    ChatListOut,
+    ChatOut,
+    MessageCreateIn,
+    MessageOut,
+    StreamParamsIn,
+)
+from app.services.context_window import (
+    estimate_tokens,
+    history_budget,
+    model_num_ctx,
+    record_prompt_eval,
+    select_context_messages,
+)
+from app.services.generation_runs import (
+    Generation,
+    cancel_chat_generations,
+    find_generation,
+    generation_for_turn,
+    record_outcome,
+    start_generation,
+)
+from app.services.generation_scheduler import GenerationQueueFull, reserve_generation
+from app.services.message_writer import AssistantMessageWriter
+from app.services.ollama_client import DEFAULT_SYSTEM_PROMPT, chat_stream, ensure_model_in_ollama
+from app.services.residency import schedule_preload, use_model
 
 
 router = APIRouter()
 
+_DEFAULT_PAGE_SIZE = 50
+_MAX_PAGE_SIZE = 200
+
 
 @router.post("/remove", status_code=status.HTTP_204_NO_CONTENT)
 def delete_chat(payload: ChatDeleteIn, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -41,19 +76,47 @@ def create_chat(payload: ChatCreateIn, user: User = Depends(get_current_user), d
     return ChatOut(id=chat.id, model_id=chat.model_id, title=chat.title, created_at=chat.created_at)
 
 
-@router.get("", response_model=list[ChatOut])
-def list_chats(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    chats = db.scalars(select(Chat).where(Chat.user_id == user.id).order_by(desc(Chat.id))).all()
-    return [ChatOut(id=c.id, model_id=c.model_id, title=c.title, created_at=c.created_at) for c in chats]
+@router.get("", response_model=ChatListOut)
+def list_chats(
+    before_id: int | None = Query(None),
+    limit: int = Query(_DEFAULT_PAGE_SIZE, ge=1, le=_MAX_PAGE_SIZE),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    stmt = select(Chat).where(Chat.user_id == user.id)
+    if before_id is not None:
+        stmt = stmt.where(Chat.id < before_id)
+    # One extra row tells whether an older page exists (served by ix_chats_user_id_id).
+    chats = db.scalars(stmt.order_by(desc(Chat.id)).limit(limit + 1)).all()
+    next_cursor = chats[limit - 1].id if len(chats) > limit else None
+    return ChatListOut(
+        chats=[ChatOut(id=c.id, model_id=c.model_id, title=c.title, created_at=c.created_at) for c in chats[:limit]],
+        next_cursor=next_cursor,
+    )
 
 
 @router.get("/{chat_id}", response_model=ChatDetailOut)
-def get_chat(chat_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_chat(
+    chat_id: int,
+    before_id: int | None = Query(None),
+    limit: int = Query(_DEFAULT_PAGE_SIZE, ge=1, le=_MAX_PAGE_SIZE),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     chat = db.get(Chat, chat_id)
     if not chat or chat.user_id != user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
+    if before_id is None:
+        # The user is about to chat with this model; warm it up while they type.
+        schedule_preload(chat.model_id)
 
-    messages = db.scalars(select(Message).where(Message.chat_id == chat.id).order_by(asc(Message.id))).all()
+    stmt = select(Message).where(Message.chat_id == chat.id)
+    if before_id is not None:
+        stmt = stmt.where(Message.id < before_id)
+    # Newest page first (served by ix_messages_chat_id_id), returned oldest-first for rendering.
+    messages = db.scalars(stmt.order_by(desc(Message.id)).limit(limit + 1)).all()
+    next_cursor = messages[limit - 1].id if len(messages) > limit else None
+    messages = list(reversed(messages[:limit]))
     return ChatDetailOut(
         chat=ChatOut(id=chat.id, model_id=chat.model_id, title=chat.title, created_at=chat.created_at),
         messages=[
@@ -63,10 +126,14 @@ def get_chat(chat_id: int, user: User = Depends(get_current_user), db: Session =
                 role=m.role,
                 content=m.content or "",
                 tokens_used=m.tokens_used,
+                status=m.status,
+                ttft_ms=m.ttft_ms,
+                duration_ms=m.duration_ms,
                 created_at=m.created_at,
             )
             for m in messages
         ],
+        next_cursor=next_cursor,
     )
 
 
@@ -82,77 +149,140 @@ def add_user_message(
     if not content:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Message must not be empty")
 
-    msg = Message(chat_id=chat.id, role="user", content=content)
+    msg = Message(chat_id=chat.id, role="user", content=content, token_count=estimate_tokens(content))
     db.add(msg)
     db.commit()
     db.refresh(msg)
+    schedule_preload(chat.model_id)
     return MessageOut(id=msg.id, chat_id=msg.chat_id, role=msg.role, content=msg.content, tokens_used=msg.tokens_used, created_at=msg.created_at)
 
 
-def _stream_assistant_impl(chat_id: int, payload: StreamParamsIn, user: User, db: Session):
-    chat = db.get(Chat, chat_id)
+def _sse_events(generation: Generation, after_seq: int = 0):
+    async def events():
+        async for event_id, event, data in generation.listen(after_seq):
+            yield {"id": event_id, "event": event, "data": data}
+
+    return EventSourceResponse(events())
+
+
+async def _stream_assistant_impl(
+    chat_id: int, payload: StreamParamsIn, user: User, db: AsyncSession, last_event_id: str | None = None
+):
+    chat = await db.get(Chat, chat_id)
     if not chat or chat.user_id != user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
 
-    model = db.get(Model, chat.model_id)
+    # Reconnects follow the generation already running instead of starting inference again.
+    if last_event_id:
+        found = find_generation(last_event_id)
+        if found is None or found[0].chat_id != chat.id:
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Generation is no longer available")
+        found[0].watch_abandoned()
+        return _sse_events(*found)
+    generation = generation_for_turn(chat.id, payload.after_message_id)
+    if generation is not None:
+        generation.watch_abandoned()
+        return _sse_events(generation)
+
+    model = await db.get(Model, chat.model_id)
     if not model:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Model not found")
     if not model.local_path:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Model is not downloaded yet")
 
     try:
-        ensure_model_in_ollama(model)
+        await ensure_model_in_ollama(model)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e)) from e
 
-    messages = db.scalars(
-        select(Message).where(Message.chat_id == chat.id, Message.id <= payload.after_message_id).order_by(asc(Message.id))
-    ).all()
+    # Always the same system header, so the prompt prefix does not change with the first turn.
+    system_prompt = (payload.system_prompt or "").strip() or DEFAULT_SYSTEM_PROMPT
+    budget = history_budget(model, max_tokens=payload.max_tokens, system_prompt=system_prompt)
+    messages = await select_context_messages(db, chat, payload.after_message_id, budget)
     if not messages or messages[-1].id != payload.after_message_id or messages[-1].role != "user":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="after_message_id must be the last user message id")
 
-    chat_messages = [{"role": m.role, "content": m.content} for m in messages]
-    if payload.system_prompt and payload.system_prompt.strip():
-        chat_messages.insert(0, {"role": "system", "content": payload.system_prompt.strip()})
+    chat_messages = [{"role": "system", "content": system_prompt}]
+    chat_messages.extend({"role": m.role, "content": m.content} for m in messages)
+    prompt_tokens = estimate_tokens(system_prompt) + sum(m.token_count or 0 for m in messages)
+
+    try:
+        ticket = reserve_generation(model.id, user.id)
+    except GenerationQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
 
-    def event_gen():
-        assistant_text_parts: list[str] = []
-        tokens_used = 0
+    async def run(generation: Generation):
+        writer: AssistantMessageWriter | None = None
+        stats: dict = {}
+        chunks = 0  # ~ tokens; Ollama streams one token per chunk
         try:
-            yield {"event": "start", "data": ""}
-            for content, done, eval_count in chat_stream(
-                model,
-                chat_messages,
-                temperature=payload.temperature,
-                max_tokens=payload.max_tokens,
-                top_p=payload.top_p,
-                top_k=payload.top_k,
-                repeat_penalty=payload.repeat_penalty,
-            ):
-                if content:
-                    assistant_text_parts.append(content)
-                    yield {"event": "token", "data": content}
-                if done:
-                    tokens_used = eval_count
-                    break
-            final_text = "".join(assistant_text_parts).strip()
-            if final_text:
-                db_save = SessionLocal()
+            async for position in ticket.wait():
+                generation.emit("queued", str(position))
+            generation_queue_wait.observe(ticket.granted_at - ticket.enqueued_at)
+            writer = AssistantMessageWriter(chat.id)
+            message_id = await writer.start()
+            generation.emit("start", str(message_id))
+            async with use_model(model) as keep_alive:
+                async for content, done, stats in chat_stream(
+                    model,
+                    chat_messages,
+                    temperature=payload.temperature,
+                    max_tokens=payload.max_tokens,
+                    top_p=payload.top_p,
+                    top_k=payload.top_k,
+                    repeat_penalty=payload.repeat_penalty,
+                    # Same window the history was budgeted for.
+                    num_ctx=model_num_ctx(model),
+                    keep_alive=keep_alive,
+                    context_key=f"chat-{chat.id}",
+                ):
+                    if content:
+                        if not chunks:
+                            generation_ttft.observe(time.monotonic() - ticket.enqueued_at)
+                        chunks += 1
+                        await writer.append(content)
+                        generation.emit("token", content)
+                    if done:
+                        if stats["prompt_eval_count"]:
+                            record_prompt_eval(prompt_tokens, stats["prompt_eval_count"])
+                        observe_generation_done(stats)
+                        break
+            await writer.finish(stats=stats)
+            record_outcome("completed", stats.get("eval_count") or chunks)
+            generation.emit("done", str(stats.get("eval_count") or 0))
+        except asyncio.CancelledError:
+            # Stopped by the user or abandoned by the client; the Ollama stream is closed by now.
+            # The partial reply is kept; listeners are told first, so their stream ends even if
+            # saving it fails.
+            record_outcome("cancelled", chunks)
+            generation.emit("error", "cancelled")
+            if writer is not None and writer.message_id is not None:
                 try:
-                    m = Message(chat_id=chat.id, role="assistant", content=final_text, tokens_used=tokens_used or None)
-                    db_save.add(m)
-                    db_save.commit()
-                finally:
-                    db_save.close()
-            yield {"event": "done", "data": str(tokens_used)}
+                    await writer.finish(status="cancelled", stats={**stats, "eval_count": chunks})
+                except Exception:
+                    pass
+            raise
         except Exception as e:
-            yield {"event": "error", "data": str(e)}
+            record_outcome("failed", chunks)
+            if writer is not None and writer.message_id is not None:
+                # Keep what was generated before the failure.
+                try:
+                    await writer.finish(status="failed", stats={**stats, "eval_count": chunks})
+                except Exception:
+                    pass
+            generation.emit("error", str(e))
+        finally:
+            ticket.release()
 
-    return EventSourceResponse(event_gen())
+    return _sse_events(start_generation(chat.id, payload.after_message_id, user.id, run))
 
 
 @router.get("/{chat_id}/stream")
-def stream_assistant_get(
+async def stream_assistant_get(
     chat_id: int,
     after_message_id: int = Query(..., alias="after_message_id"),
     temperature: float = Query(0.7),
@@ -161,8 +291,9 @@ def stream_assistant_get(
     top_k: int = Query(40),
     repeat_penalty: float = Query(1.1),
     system_prompt: str | None = Query(None),
+    last_event_id: str | None = Header(None, alias="Last-Event-ID"),
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     payload = StreamParamsIn(
         after_message_id=after_message_id,
@@ -173,15 +304,28 @@ def stream_assistant_get(
         repeat_penalty=repeat_penalty,
         system_prompt=system_prompt,
     )
-    return _stream_assistant_impl(chat_id, payload, user, db)
+    return await _stream_assistant_impl(chat_id, payload, user, db, last_event_id)
 
 
 @router.post("/{chat_id}/stream")
-def stream_assistant_post(
+async def stream_assistant_post(
     chat_id: int,
     payload: StreamParamsIn,
+    last_event_id: str | None = Header(None, alias="Last-Event-ID"),
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    return _stream_assistant_impl(chat_id, payload, user, db)
+    return await _stream_assistant_impl(chat_id, payload, user, db, last_event_id)
 
+
+@router.post("/{chat_id}/stream/cancel")
+async def cancel_stream(
+    chat_id: int,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Stop the chat's running generation; the text generated so far is kept."""
+    chat = await db.get(Chat, chat_id)
+    if not chat or chat.user_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
+    return {"ok": True, "cancelled": cancel_chat_generations(chat.id)}
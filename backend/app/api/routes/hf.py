@@ -1,52 +1,74 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from huggingface_hub import HfApi
+from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_token_user
 from app.core.config import settings
 from app.db.models import User
-from app.schemas import HfModelSummary, HfRepoFile
+from app.db.session import get_db
+from app.schemas import HfCatalogFile, HfCatalogRepo, HfModelSummary, HfRepoFile
+from app.services.hf_cache import repo_files_cache, search_cache
+from app.services.hf_catalog import request_catalog_refresh, search_catalog
 
 
 router = APIRouter()
 
 
-def _api() -> HfApi:
+def get_hf_api() -> HfApi:
     # One global token (MVP). If HF_TOKEN empty, public search still works.
+    # A dependency so tests can swap in a fake via app.dependency_overrides.
     return HfApi(token=settings.hf_token or None)
 
 
+def _search(api: HfApi, q: str, limit: int) -> list[HfModelSummary]:
+    models = api.list_models(
+        search=q,
+        sort="downloads",
+        limit=limit,
+    )
+    out: list[HfModelSummary] = []
+    for m in models:
+        # modelId deprecated/removed in newer huggingface_hub; use repo_id or id
+        repo_id = getattr(m, "repo_id", None) or getattr(m, "id", None) or getattr(m, "modelId", None)
+        if not repo_id:
+            continue
+        out.append(
+            HfModelSummary(
+                repo_id=repo_id,
+                likes=getattr(m, "likes", None),
+                downloads=getattr(m, "downloads", None),
+                pipeline_tag=getattr(m, "pipeline_tag", None),
+                tags=list(getattr(m, "tags", []) or []),
+            )
+        )
+    return out
+
+
+def _list_files(api: HfApi, repo_id: str, only_gguf: bool) -> list[HfRepoFile]:
+    files = api.list_repo_files(repo_id=repo_id, repo_type="model")
+    if only_gguf:
+        files = [f for f in files if f.lower().endswith(".gguf")]
+    files.sort()
+    return [HfRepoFile(filename=f) for f in files]
+
+
 @router.get("/models", response_model=list[HfModelSummary])
 def search_models(
     q: str | None = None,
     limit: int = 20,
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_token_user),
+    api: HfApi = Depends(get_hf_api),
 ):
     _ = user
     limit = max(1, min(int(limit), 50))
+    # Hub search is case-insensitive; one cache entry per normalised query.
+    q = (q or "").strip().lower()
     try:
-        models = _api().list_models(
-            search=q or "",
-            sort="downloads",
-            limit=limit,
-        )
-        out: list[HfModelSummary] = []
-        for m in models:
-            # modelId deprecated/removed in newer huggingface_hub; use repo_id or id
-            repo_id = getattr(m, "repo_id", None) or getattr(m, "id", None) or getattr(m, "modelId", None)
-            if not repo_id:
-                continue
-            out.append(
-                HfModelSummary(
-                    repo_id=repo_id,
-                    likes=getattr(m, "likes", None),
-                    downloads=getattr(m, "downloads", None),
-                    pipeline_tag=getattr(m, "pipeline_tag", None),
-                    tags=list(getattr(m, "tags", []) or []),
-                )
-            )
-        return out
+        return search_cache.get((q, limit), lambda: _search(api, q, limit))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
 
@@ -55,15 +77,70 @@ def search_models(
 def repo_files(
     repo_id: str,
     only_gguf: bool = True,
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_token_user),
+    api: HfApi = Depends(get_hf_api),
 ):
     _ = user
     try:
-        files = _api().list_repo_files(repo_id=repo_id, repo_type="model")
-        if only_gguf:
-            files = [f for f in files if f.lower().endswith(".gguf")]
-        files.sort()
-        return [HfRepoFile(filename=f) for f in files]
+        return repo_files_cache.get((repo_id, only_gguf), lambda: _list_files(api, repo_id, only_gguf))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
 
+
+@router.get("/catalog", response_model=list[HfCatalogRepo])
+def catalog(
+    q: str | None = None,
+    quantization: str | None = None,
+    architecture: str | None = None,
+    min_size_bytes: int | None = None,
+    max_size_bytes: int | None = None,
+    min_params_b: float | None = None,
+    max_params_b: float | None = None,
+    sort: Literal["downloads", "likes", "updated"] = "downloads",
+    limit: int = 20,
+    offset: int = 0,
+    user: User = Depends(get_token_user),
+    db: Session = Depends(get_db),
+):
+    """Search the local GGUF catalog; no Hub call, so it works offline. Files are filtered too."""
+    _ = user
+    limit = max(1, min(int(limit), 100))
+    results = search_catalog(
+        db,
+        q=q,
+        quantization=quantization,
+        architecture=architecture,
+        min_size_bytes=min_size_bytes,
+        max_size_bytes=max_size_bytes,
+        min_params=int(min_params_b * 1e9) if min_params_b is not None else None,
+        max_params=int(max_params_b * 1e9) if max_params_b is not None else None,
+        sort=sort,
+        limit=limit,
+        offset=max(0, int(offset)),
+    )
+    return [
+        HfCatalogRepo(
+            repo_id=repo.repo_id,
+            author=repo.author,
+            downloads=repo.downloads,
+            likes=repo.likes,
+            architecture=repo.architecture,
+            parameter_count=repo.parameter_count,
+            context_length=repo.context_length,
+            tags=[t for t in repo.tags.split(",") if t],
+            last_modified=repo.last_modified,
+            files=[
+                HfCatalogFile(filename=f.filename, size_bytes=f.size_bytes, quantization=f.quantization)
+                for f in files
+            ],
+        )
+        for repo, files in results
+    ]
+
+
+@router.post("/catalog/refresh", status_code=status.HTTP_202_ACCEPTED)
+def refresh_catalog_now(user: User = Depends(get_current_user)):
+    _ = user
+    if not request_catalog_refresh():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Catalog refresh is disabled")
+    return {"ok": True}
@@ -1,25 +1,41 @@
+import json
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import desc, func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import desc, func, or_, select
 from sqlalchemy.orm import Session
+from sse_starlette.sse import EventSourceResponse
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_token_user
 from app.db.models import Chat, Model, ModelDownloadJob, User
 from app.db.session import get_db
-from app.schemas import ModelDownloadIn, ModelDownloadJobOut, ModelOut, ModelParamsOut, ModelSettingsIn
-from app.services.hf_downloader import cancel_download_job, delete_model_artifacts, start_download_job
+from app.schemas import (
+    ModelDownloadIn,
+    ModelDownloadJobOut,
+    ModelJobListOut,
+    ModelLibraryItemOut,
+    ModelOut,
+    ModelParamsOut,
+    ModelSettingsIn,
+)
+from app.services.download_scheduler import enqueue_download_job
+from app.services.hf_downloader import cancel_download_job, delete_model_artifacts
 from app.services.ollama_client import (
     delete_model_from_ollama,
     get_model_parameters,
     list_loaded_ollama,
-    load_model_in_ollama,
-    unload_model_from_ollama,
+    model_id_from_ollama_name,
+    run_ollama_call,
 )
+from app.services.progress_bus import live_state, publish, snapshot, subscribe
+from app.services.residency import load_resident, residency_state, unload_resident
 
 
 router = APIRouter()
 
+_DEFAULT_JOB_PAGE_SIZE = 50
+_MAX_JOB_PAGE_SIZE = 200
+
 
 def _resolved_model_params(model: Model) -> ModelParamsOut:
     saved = {
@@ -28,18 +44,20 @@ def _resolved_model_params(model: Model) -> ModelParamsOut:
         "top_p": model.default_top_p,
         "top_k": model.default_top_k,
         "repeat_penalty": model.default_repeat_penalty,
+        "num_ctx": model.default_num_ctx,
     }
     saved_present = any(v is not None for v in saved.values())
 
     ollama = {}
     if model.local_path:
-        raw = get_model_parameters(model)
+        raw = run_ollama_call(get_model_parameters, model)
         ollama = {
             "temperature": raw.get("temperature"),
             "num_predict": raw.get("num_predict"),
             "top_p": raw.get("top_p"),
             "top_k": raw.get("top_k"),
             "repeat_penalty": raw.get("repeat_penalty"),
+            "num_ctx": raw.get("num_ctx"),
         }
     ollama_present = any(v is not None for v in ollama.values())
 
@@ -56,18 +74,37 @@ def _resolved_model_params(model: Model) -> ModelParamsOut:
 
 
 def _job_out(job: ModelDownloadJob) -> ModelDownloadJobOut:
+    progress_bytes, expected_bytes = job.progress_bytes, job.expected_bytes
+    live = live_state(job.id) if job.status == "running" else None
+    if live:
+        # The DB only holds periodic checkpoints of a running download.
+        progress_bytes = live.get("progress_bytes", progress_bytes)
+        expected_bytes = live.get("expected_bytes") or expected_bytes
     return ModelDownloadJobOut(
         id=job.id,
         model_id=job.model_id,
         status=job.status,
-        progress_bytes=job.progress_bytes,
-        expected_bytes=job.expected_bytes,
+        priority=job.priority,
+        progress_bytes=progress_bytes,
+        expected_bytes=expected_bytes,
         error=job.error,
         started_at=job.started_at,
         finished_at=job.finished_at,
     )
 
 
+def _publish_job_out(out: ModelDownloadJobOut) -> ModelDownloadJobOut:
+    publish(
+        out.id,
+        model_id=out.model_id,
+        status=out.status,
+        progress_bytes=out.progress_bytes,
+        expected_bytes=out.expected_bytes,
+        error=out.error,
+    )
+    return out
+
+
 def _cancel_job_in_db(db: Session, job: ModelDownloadJob, reason: str) -> ModelDownloadJobOut:
     model = db.get(Model, job.model_id)
     if model:
@@ -79,27 +116,68 @@ def _cancel_job_in_db(db: Session, job: ModelDownloadJob, reason: str) -> ModelD
     job.finished_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(job)
-    return _job_out(job)
+    return _publish_job_out(_job_out(job))
+
+
+def _model_fields(m: Model) -> dict:
+    return dict(
+        id=m.id,
+        hf_repo=m.hf_repo,
+        hf_filename=m.hf_filename,
+        local_path=m.local_path,
+        size_bytes=m.size_bytes,
+        sha256=m.sha256,
+        architecture=m.architecture,
+        context_length=m.context_length,
+        quantization=m.quantization,
+        parameter_count=m.parameter_count,
+        default_temperature=m.default_temperature,
+        default_max_tokens=m.default_max_tokens,
+        default_top_p=m.default_top_p,
+        default_top_k=m.default_top_k,
+        default_repeat_penalty=m.default_repeat_penalty,
+        default_num_ctx=m.default_num_ctx,
+        created_at=m.created_at,
+    )
+
+
+def _loaded_model_ids() -> set[int]:
+    """Ids of our models Ollama holds in memory, from its "boom-{id}" names."""
+    ids = (model_id_from_ollama_name(name) for name in run_ollama_call(list_loaded_ollama))
+    return {model_id for model_id in ids if model_id is not None}
 
 
 @router.get("", response_model=list[ModelOut])
-def list_models(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_models(user: User = Depends(get_token_user), db: Session = Depends(get_db)):
     items = db.scalars(select(Model).order_by(desc(Model.id))).all()
+    return [ModelOut(**_model_fields(m)) for m in items]
+
+
+@router.get("/library", response_model=list[ModelLibraryItemOut])
+def list_model_library(user: User = Depends(get_token_user), db: Session = Depends(get_db)):
+    """Models with their latest download job and whether Ollama has them loaded: one query plus one Ollama call."""
+    latest = (
+        select(ModelDownloadJob.model_id, func.max(ModelDownloadJob.id).label("job_id"))
+        .group_by(ModelDownloadJob.model_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(Model, ModelDownloadJob)
+        .outerjoin(latest, latest.c.model_id == Model.id)
+        .outerjoin(ModelDownloadJob, ModelDownloadJob.id == latest.c.job_id)
+        .order_by(desc(Model.id))
+    ).all()
+    try:
+        loaded_ids = _loaded_model_ids()
+    except Exception:
+        loaded_ids = None
     return [
-        ModelOut(
-            id=m.id,
-            hf_repo=m.hf_repo,
-            hf_filename=m.hf_filename,
-            local_path=m.local_path,
-            size_bytes=m.size_bytes,
-            default_temperature=m.default_temperature,
-            default_max_tokens=m.default_max_tokens,
-            default_top_p=m.default_top_p,
-            default_top_k=m.default_top_k,
-            default_repeat_penalty=m.default_repeat_penalty,
-            created_at=m.created_at,
+        ModelLibraryItemOut(
+            **_model_fields(m),
+            latest_job=_job_out(job) if job is not None else None,
+            loaded=m.id in loaded_ids if loaded_ids is not None else None,
         )
-        for m in items
+        for m, job in rows
     ]
 
 
@@ -128,29 +206,52 @@ def download_model(payload: ModelDownloadIn, user: User = Depends(get_current_us
         db.commit()
         db.refresh(model)
 
-    job = ModelDownloadJob(model_id=model.id, status="pending", progress_bytes=0)
+    job = ModelDownloadJob(model_id=model.id, status="pending", priority=payload.priority, progress_bytes=0)
     db.add(job)
     db.commit()
     db.refresh(job)
 
-    start_download_job(job.id)
+    out = _publish_job_out(_job_out(job))
+    enqueue_download_job(job.id)
 
-    return _job_out(job)
+    return out
+
+
+@router.get("/jobs/stream")
+async def stream_jobs(user: User = Depends(get_token_user)):
+    """Push download job changes: current active jobs first, then every change as `event: job`."""
+
+    async def event_gen():
+        for state in snapshot():
+            yield {"event": "job", "data": json.dumps(state)}
+        async for changed in subscribe():
+            for state in changed:
+                yield {"event": "job", "data": json.dumps(state)}
+
+    return EventSourceResponse(event_gen())
+
+
+@router.get("/residency")
+async def get_residency(user: User = Depends(get_token_user)):
+    """Models held in Ollama memory with footprint, usage and keep_alive, plus the memory budget."""
+    return await residency_state()
 
 
 @router.get("/loaded")
-def list_loaded_models(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def list_loaded_models(user: User = Depends(get_token_user), db: Session = Depends(get_db)):
     """Return model_ids currently loaded in Ollama (shared for all users)."""
-    loaded_names = list_loaded_ollama()
+    loaded_ids = _loaded_model_ids()
     models = []
-    for m in db.scalars(select(Model)).all():
-        if any(n == f"boom-{m.id}" or n.startswith(f"boom-{m.id}:") for n in loaded_names):
-            models.append({"id": m.id, "hf_repo": m.hf_repo, "hf_filename": m.hf_filename})
+    if loaded_ids:
+        rows = db.execute(
+            select(Model.id, Model.hf_repo, Model.hf_filename).where(Model.id.in_(loaded_ids)).order_by(Model.id)
+        ).all()
+        models = [{"id": row.id, "hf_repo": row.hf_repo, "hf_filename": row.hf_filename} for row in rows]
     return {"model_ids": [m["id"] for m in models], "models": models}
 
 
 @router.get("/{model_id}/ollama-params", response_model=ModelParamsOut)
-def get_ollama_params(model_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_ollama_params(model_id: int, user: User = Depends(get_token_user), db: Session = Depends(get_db)):
     """Return model generation defaults, preferring saved app settings over Ollama parameters."""
     model = db.get(Model, model_id)
     if not model:
@@ -174,6 +275,7 @@ def update_model_settings(
     model.default_top_p = payload.top_p
     model.default_top_k = payload.top_k
     model.default_repeat_penalty = payload.repeat_penalty
+    model.default_num_ctx = payload.num_ctx
     db.commit()
     db.refresh(model)
     return _resolved_model_params(model)
@@ -195,9 +297,10 @@ def retry_download_model(model_id: int, user: User = Depends(get_current_user),
     db.commit()
     db.refresh(job)
 
-    start_download_job(job.id)
+    out = _publish_job_out(_job_out(job))
+    enqueue_download_job(job.id)
 
-    return _job_out(job)
+    return out
 
 
 @router.post("/jobs/{job_id}/cancel", response_model=ModelDownloadJobOut)
@@ -226,7 +329,8 @@ def load_model(model_id: int, user: User = Depends(get_current_user), db: Sessio
     if not model.local_path:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Model is not downloaded yet")
     try:
-        load_model_in_ollama(model)
+        # Unloads idle models first if this one would not fit into the memory budget.
+        run_ollama_call(load_resident, model)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e)) from e
     return {"ok": True, "model_id": model_id}
@@ -239,7 +343,7 @@ def unload_model(model_id: int, user: User = Depends(get_current_user), db: Sess
     if not model:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Model not found")
     try:
-        unload_model_from_ollama(model)
+        run_ollama_call(unload_resident, model)
     except Exception:
         pass  # non-fatal
     return {"ok": True, "model_id": model_id, "was_loaded": False}
@@ -270,11 +374,11 @@ def delete_model(model_id: int, user: User = Depends(get_current_user), db: Sess
         )
 
     try:
-        unload_model_from_ollama(model)
+        run_ollama_call(unload_resident, model)
     except Exception:
         pass
     try:
-        delete_model_from_ollama(model)
+        run_ollama_call(delete_model_from_ollama, model)
     except Exception:
         pass
 
@@ -284,8 +388,25 @@ def delete_model(model_id: int, user: User = Depends(get_current_user), db: Sess
     return {"ok": True, "model_id": model_id}
 
 
-@router.get("/jobs", response_model=list[ModelDownloadJobOut])
-def list_jobs(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    jobs = db.scalars(select(ModelDownloadJob).order_by(desc(ModelDownloadJob.id))).all()
-    return [_job_out(job) for job in jobs]
+@router.get("/jobs", response_model=ModelJobListOut)
+def list_jobs(
+    status_filter: list[str] | None = Query(None, alias="status"),
+    since: datetime | None = Query(None),
+    before_id: int | None = Query(None),
+    limit: int = Query(_DEFAULT_JOB_PAGE_SIZE, ge=1, le=_MAX_JOB_PAGE_SIZE),
+    user: User = Depends(get_token_user),
+    db: Session = Depends(get_db),
+):
+    """Download jobs, newest first. status may repeat (?status=pending&status=running); since keeps
+    unfinished jobs and those finished at or after it."""
+    stmt = select(ModelDownloadJob)
+    if status_filter:
+        stmt = stmt.where(ModelDownloadJob.status.in_(status_filter))
+    if since is not None:
+        stmt = stmt.where(or_(ModelDownloadJob.finished_at.is_(None), ModelDownloadJob.finished_at >= since))
+    if before_id is not None:
+        stmt = stmt.where(ModelDownloadJob.id < before_id)
+    jobs = db.scalars(stmt.order_by(desc(ModelDownloadJob.id)).limit(limit + 1)).all()
+    next_cursor = jobs[limit - 1].id if len(jobs) > limit else None
+    return ModelJobListOut(jobs=[_job_out(job) for job in jobs[:limit]], next_cursor=next_cursor)
 
@@ -0,0 +1,100 @@
+"""Bounded LRU/TTL caches for decoded access tokens and authenticated users."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.models import User
+
+
+class _TtlLru:
+    """Thread-safe LRU with per-entry expiry; sync routes resolve users from the threadpool."""
+
+    def __init__(self, maxsize: int, ttl_sec: float):
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                self._items.pop(key, None)
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value, ttl_sec: float | None = None) -> None:
+        ttl = self.ttl_sec if ttl_sec is None else min(ttl_sec, self.ttl_sec)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+# token -> decoded claims; user_id -> detached User snapshot
+_tokens = _TtlLru(settings.auth_cache_size, settings.auth_cache_ttl_sec)
+_users = _TtlLru(settings.auth_cache_size, settings.auth_cache_ttl_sec)
+
+
+def get_cached_claims(token: str) -> dict | None:
+    return _tokens.get(token)
+
+
+def cache_claims(token: str, claims: dict) -> None:
+    exp = claims.get("exp")
+    # Never serve a token from cache past its own expiry.
+    ttl = float(exp) - time.time() if exp is not None else None
+    _tokens.put(token, claims, ttl)
+
+
+def get_cached_user(user_id: int) -> User | None:
+    return _users.get(user_id)
+
+
+def cache_user(user: User) -> User:
+    """Store a session-independent copy so it can be shared across requests and threads."""
+    snapshot = User(id=user.id, email=user.email, created_at=user.created_at)
+    _users.put(user.id, snapshot)
+    return snapshot
+
+
+def invalidate_user(user_id: int) -> None:
+    _users.pop(user_id)
+
+
+def auth_cache_stats() -> dict:
+    return {"tokens": _tokens.stats(), "users": _users.stats()}
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
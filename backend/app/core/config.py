@@ -6,12 +6,78 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=None, case_sensitive=False)
 
     database_url: str = Field(default="sqlite:///./dev.db", validation_alias="DATABASE_URL")
+    # Connection pools of the request engines (sync and async each get one of this size).
+    db_pool_size: int = Field(default=10, ge=1, validation_alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, ge=0, validation_alias="DB_MAX_OVERFLOW")
+    # Below MariaDB's wait_timeout, so idle connections are replaced before the server drops them.
+    db_pool_recycle_sec: int = Field(default=1800, validation_alias="DB_POOL_RECYCLE_SEC")
+    db_pool_timeout_sec: float = Field(default=30.0, gt=0, validation_alias="DB_POOL_TIMEOUT_SEC")
+    # Separate pools for background writers (downloads, streamed replies, preloads).
+    db_background_pool_size: int = Field(default=5, ge=1, validation_alias="DB_BACKGROUND_POOL_SIZE")
+    db_background_max_overflow: int = Field(default=10, ge=0, validation_alias="DB_BACKGROUND_MAX_OVERFLOW")
     jwt_secret: str = Field(default="change-me", validation_alias="JWT_SECRET")
     jwt_algorithm: str = Field(default="HS256", validation_alias="JWT_ALGORITHM")
     access_token_exp_minutes: int = Field(default=60 * 24 * 7, validation_alias="ACCESS_TOKEN_EXP_MINUTES")
+    # bcrypt cost; hashes with a different cost are rehashed on the next successful login.
+    bcrypt_rounds: int = Field(default=12, ge=4, le=31, validation_alias="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(default=2, validation_alias="PASSWORD_HASH_WORKERS")
+    password_hash_queue_size: int = Field(default=16, validation_alias="PASSWORD_HASH_QUEUE_SIZE")
+    auth_cache_size: int = Field(default=1024, validation_alias="AUTH_CACHE_SIZE")
+    auth_cache_ttl_sec: float = Field(default=60.0, validation_alias="AUTH_CACHE_TTL_SEC")
+    # Read-only endpoints may accept the signed token claims without checking the user row.
+    auth_trust_token_claims: bool = Field(default=False, validation_alias="AUTH_TRUST_TOKEN_CLAIMS")
 
     hf_token: str | None = Field(default=None, validation_alias="HF_TOKEN")
+    # Hub search / repo file list responses: fresh for TTL, then served stale while refreshed.
+    hf_cache_size: int = Field(default=512, ge=0, validation_alias="HF_CACHE_SIZE")
+    hf_cache_ttl_sec: float = Field(default=300.0, ge=0, validation_alias="HF_CACHE_TTL_SEC")
+    hf_cache_stale_sec: float = Field(default=3600.0, ge=0, validation_alias="HF_CACHE_STALE_SEC")
+    # Local catalog of the most downloaded GGUF repos behind /hf/catalog (0 = never refresh it).
+    hf_catalog_refresh_sec: float = Field(default=6 * 3600.0, ge=0, validation_alias="HF_CATALOG_REFRESH_SEC")
+    hf_catalog_max_repos: int = Field(default=1000, ge=1, validation_alias="HF_CATALOG_MAX_REPOS")
     models_dir: str = Field(default="/models", validation_alias="MODELS_DIR")
+    download_connections: int = Field(default=4, ge=1, validation_alias="DOWNLOAD_CONNECTIONS")
+    download_chunk_bytes: int = Field(default=64 * 1024 * 1024, ge=1024 * 1024, validation_alias="DOWNLOAD_CHUNK_BYTES")
+    download_max_concurrent: int = Field(default=2, ge=1, validation_alias="DOWNLOAD_MAX_CONCURRENT")
+    download_host_connections: int = Field(default=8, ge=1, validation_alias="DOWNLOAD_HOST_CONNECTIONS")
+    download_queue_order: str = Field(default="fifo", pattern="^(fifo|priority)$", validation_alias="DOWNLOAD_QUEUE_ORDER")
+    # Live progress goes to SSE subscribers; the DB only gets a checkpoint this often.
+    download_checkpoint_sec: float = Field(default=30.0, gt=0, validation_alias="DOWNLOAD_CHECKPOINT_SEC")
+
+    ollama_host: str = Field(default="http://localhost:11434", validation_alias="OLLAMA_HOST")
+    ollama_max_connections: int = Field(default=100, validation_alias="OLLAMA_MAX_CONNECTIONS")
+    ollama_max_keepalive_connections: int = Field(default=20, validation_alias="OLLAMA_MAX_KEEPALIVE_CONNECTIONS")
+    ollama_keepalive_expiry: float = Field(default=30.0, validation_alias="OLLAMA_KEEPALIVE_EXPIRY")
+    ollama_registry_ttl_sec: float = Field(default=300.0, validation_alias="OLLAMA_REGISTRY_TTL_SEC")
+    ollama_create_concurrency: int = Field(default=2, validation_alias="OLLAMA_CREATE_CONCURRENCY")
+
+    # Residency manager: RAM loaded models may take in Ollama (0 = 80% of this host's RAM; set it
+    # when Ollama runs elsewhere) and which idle model is unloaded first when a new one needs room.
+    model_memory_budget_mb: int = Field(default=0, ge=0, validation_alias="MODEL_MEMORY_BUDGET_MB")
+    model_eviction_policy: str = Field(default="lru", pattern="^(lru|lfu)$", validation_alias="MODEL_EVICTION_POLICY")
+    # Footprint of a model Ollama has not reported yet, as a multiple of its file size (weights + KV cache).
+    model_memory_overhead: float = Field(default=1.2, ge=1.0, validation_alias="MODEL_MEMORY_OVERHEAD")
+    # keep_alive for a model without usage history, and the range adaptive keep_alive stays in.
+    keep_alive_default_sec: int = Field(default=1800, ge=0, validation_alias="KEEP_ALIVE_DEFAULT_SEC")
+    keep_alive_min_sec: int = Field(default=300, ge=0, validation_alias="KEEP_ALIVE_MIN_SEC")
+    keep_alive_max_sec: int = Field(default=3600, ge=0, validation_alias="KEEP_ALIVE_MAX_SEC")
+    # Warm up a chat's model in the background when the chat is opened or a message is posted.
+    model_preload: bool = Field(default=False, validation_alias="MODEL_PRELOAD")
+
+    # Generations run at once per model (match OLLAMA_NUM_PARALLEL); the rest wait in a fair queue.
+    generation_slots_per_model: int = Field(default=2, ge=1, validation_alias="GENERATION_SLOTS_PER_MODEL")
+    # Waiting requests per model / per user and model before new ones get 429.
+    generation_queue_max: int = Field(default=32, ge=0, validation_alias="GENERATION_QUEUE_MAX")
+    generation_queue_per_user: int = Field(default=4, ge=1, validation_alias="GENERATION_QUEUE_PER_USER")
+    # Events kept per generation for clients that reconnect with Last-Event-ID.
+    generation_replay_events: int = Field(default=4096, ge=16, validation_alias="GENERATION_REPLAY_EVENTS")
+    # A generation keeps running this long after its last client left, so a reconnect can pick it up
+    # (and stays attachable this long after it finished). 0 stops it as soon as the client is gone.
+    generation_detach_grace_sec: float = Field(default=5.0, ge=0, validation_alias="GENERATION_DETACH_GRACE_SEC")
+
+    # Context window assumed for models without a saved num_ctx (matches Ollama's default).
+    default_num_ctx: int = Field(default=4096, validation_alias="DEFAULT_NUM_CTX")
+    context_reply_reserve_tokens: int = Field(default=512, validation_alias="CONTEXT_REPLY_RESERVE_TOKENS")
 
     cors_origins: str = Field(default="http://localhost:5173", validation_alias="CORS_ORIGINS")
 
@@ -0,0 +1,212 @@
+"""Prometheus metrics in the text exposition format, without a client library.
+
+Histograms and counters are updated where things happen: one bucket increment under a lock per
+request, generation or download, never per token. Everything the *_stats() functions already
+count is turned into samples at scrape time instead (see /metrics in app.main), so nothing here
+touches the database.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+
+_registry: list[_Metric] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> per-bucket counts (not cumulative; the last one is +Inf), then sum
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        lines = self.header()
+        for labels, series in snapshot.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_number(float(bound))}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def sample_lines(name: str, kind: str, help_text: str, samples: list[tuple[dict, float | int | None]]) -> list[str]:
+    """Lines for a gauge or counter read from a *_stats() dict at scrape time; None values are skipped."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        names = tuple(labels)
+        lines.append(f"{name}{_labels(names, tuple(labels[n] for n in names))} {_number(value)}")
+    return lines
+
+
+def render(extra_lines: list[str]) -> str:
+    lines = list(extra_lines)
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_WAIT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+_EVAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+_MB = 1024 * 1024
+
+http_request_duration = Histogram(
+    "boom_http_request_duration_seconds",
+    "Time until the response headers were sent (streams are counted until they start), by route template.",
+    _LATENCY_BUCKETS,
+    ("method", "route", "status"),
+)
+generation_queue_wait = Histogram(
+    "boom_generation_queue_wait_seconds", "Time a chat generation waited for a model slot.", _WAIT_BUCKETS
+)
+generation_ttft = Histogram(
+    "boom_generation_ttft_seconds",
+    "Time from the stream request to the first generated token, queueing and model load included.",
+    _WAIT_BUCKETS,
+)
+generation_tokens_per_second = Histogram(
+    "boom_generation_tokens_per_second",
+    "Decode speed of completed generations (eval_count / eval_duration reported by Ollama).",
+    (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200),
+)
+generation_prompt_eval = Histogram(
+    "boom_generation_prompt_eval_seconds", "Prompt evaluation time reported by Ollama.", _EVAL_BUCKETS
+)
+generation_eval = Histogram("boom_generation_eval_seconds", "Token generation time reported by Ollama.", _EVAL_BUCKETS)
+download_throughput = Histogram(
+    "boom_download_throughput_bytes_per_second",
+    "Average transfer rate of each finished download job (bytes fetched in this run / its duration).",
+    tuple(mb * _MB for mb in (1, 5, 10, 25, 50, 100, 250, 500, 1000)),
+)
+download_bytes = Counter("boom_download_bytes_total", "Bytes fetched by finished download jobs.")
+download_jobs = Counter("boom_download_jobs_total", "Download jobs by how they ended.", ("status",))
+
+
+def observe_generation_done(stats: dict) -> None:
+    """Timings from Ollama's final chunk (durations in nanoseconds)."""
+    eval_count = stats.get("eval_count") or 0
+    eval_ns = stats.get("eval_duration") or 0
+    prompt_eval_ns = stats.get("prompt_eval_duration") or 0
+    if prompt_eval_ns:
+        generation_prompt_eval.observe(prompt_eval_ns / 1e9)
+    if eval_ns:
+        generation_eval.observe(eval_ns / 1e9)
+        if eval_count:
+            generation_tokens_per_second.observe(eval_count / (eval_ns / 1e9))
+
+
+def _route_template(scope) -> str:
+    """Template of the matched route, e.g. "/chats/{chat_id}/stream"; "unmatched" if none matched.
+
+    Newer FastAPI versions leave scope["route"] holding the path inside its included router, so the
+    router prefix is taken from the request path: everything before the route's own segments.
+    """
+    route_path = getattr(scope.get("route"), "path", None)
+    if route_path is None:
+        return "unmatched"
+    own_segments = route_path.count("/")
+    segments = scope["path"].rstrip("/").split("/")
+    prefix = "/".join(segments[: len(segments) - own_segments]) if own_segments else "/".join(segments)
+    return (prefix + route_path) or "/"
+
+
+class MetricsMiddleware:
+    """Pure ASGI (no BaseHTTPMiddleware): times each request up to its http.response.start."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        observed = False
+
+        def observe(status: int) -> None:
+            nonlocal observed
+            observed = True
+            # Route templates only: raw paths of unmatched requests would make unbounded label sets.
+            elapsed = time.perf_counter() - started
+            http_request_duration.observe(elapsed, scope["method"], _route_template(scope), status)
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start" and not observed:
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        except BaseException:
+            if not observed:
+                observe(500)
+            raise
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from jose import JWTError, jwt
@@ -8,7 +11,24 @@ from passlib.context import CryptContext
 from app.core.config import settings
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min == max == default so hashes made with any other cost are flagged for rehash.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+# bcrypt releases the GIL, so a small dedicated pool keeps login bursts away from
+# the Starlette threadpool that the rest of the API shares.
+_hash_pool = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt")
+_hash_pending = 0
+_hash_pending_lock = threading.Lock()
+
+
+class PasswordHasherBusyError(RuntimeError):
+    pass
 
 
 def hash_password(password: str) -> str:
@@ -19,9 +39,40 @@ def verify_password(password: str, password_hash: str) -> bool:
     return pwd_context.verify(password, password_hash)
 
 
-def create_access_token(subject: str, expires_delta: timedelta | None = None) -> str:
+async def _run_hasher(fn, *args):
+    global _hash_pending
+    with _hash_pending_lock:
+        if _hash_pending >= settings.password_hash_workers + settings.password_hash_queue_size:
+            raise PasswordHasherBusyError("Too many concurrent password checks")
+        _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        with _hash_pending_lock:
+            _hash_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(pwd_context.hash, password)
+
+
+async def verify_password_async(password: str, password_hash: str) -> tuple[bool, str | None]:
+    """Returns (ok, new_hash); new_hash is set when the stored hash uses an outdated cost."""
+    return await _run_hasher(pwd_context.verify_and_update, password, password_hash)
+
+
+def password_hasher_stats() -> dict:
+    return {
+        "workers": settings.password_hash_workers,
+        "queue_size": settings.password_hash_queue_size,
+        "pending": _hash_pending,
+        "rounds": settings.bcrypt_rounds,
+    }
+
+
+def create_access_token(subject: str, expires_delta: timedelta | None = None, claims: dict | None = None) -> str:
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=settings.access_token_exp_minutes))
-    to_encode = {"sub": subject, "exp": expire}
+    to_encode = {**(claims or {}), "sub": subject, "exp": expire}
     return jwt.encode(to_encode, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
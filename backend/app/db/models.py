@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -33,11 +33,20 @@ class Model(Base):
     hf_filename: Mapped[str] = mapped_column(String(255), nullable=False)
     local_path: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # Hex SHA-256 of the GGUF, verified against the Hub; names its blob in MODELS_DIR/blobs.
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    # Read from the GGUF header (app.services.gguf); architecture is NULL until the file was parsed.
+    architecture: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    context_length: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    quantization: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    parameter_count: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    chat_template: Mapped[str | None] = mapped_column(Text, nullable=True)
     default_temperature: Mapped[float | None] = mapped_column(Float, nullable=True)
     default_max_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
     default_top_p: Mapped[float | None] = mapped_column(Float, nullable=True)
     default_top_k: Mapped[int | None] = mapped_column(Integer, nullable=True)
     default_repeat_penalty: Mapped[float | None] = mapped_column(Float, nullable=True)
+    default_num_ctx: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
@@ -50,11 +59,13 @@ class Model(Base):
 
 class ModelDownloadJob(Base):
     __tablename__ = "model_download_jobs"
+    __table_args__ = (Index("ix_model_download_jobs_status_id", "status", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     model_id: Mapped[int] = mapped_column(ForeignKey("models.id"), nullable=False, index=True)
 
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="pending")
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     progress_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
     expected_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     error: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -67,12 +78,15 @@ class ModelDownloadJob(Base):
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (Index("ix_chats_user_id_id", "user_id", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
     model_id: Mapped[int] = mapped_column(ForeignKey("models.id"), nullable=False, index=True)
 
     title: Mapped[str] = mapped_column(String(255), nullable=False, default="New chat")
+    # First message of the history window sent to the model; None = from the beginning.
+    context_start_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     user: Mapped[User] = relationship(back_populates="chats")
@@ -82,13 +96,67 @@ class Chat(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_chat_id_id", "chat_id", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), nullable=False, index=True)
     role: Mapped[str] = mapped_column(String(32), nullable=False)  # system/user/assistant
     content: Mapped[str] = mapped_column(Text, nullable=False)
     tokens_used: Mapped[int | None] = mapped_column(Integer, nullable=True)  # for assistant messages
+    token_count: Mapped[int | None] = mapped_column(Integer, nullable=True)  # prompt-side size, for context budgeting
+    # Prompt tokens Ollama evaluated for this reply (the rest of the prompt came from its cache)
+    prompt_eval_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Assistant replies: None once complete, "streaming" while being generated, "failed" / "cancelled"
+    # if cut short
+    status: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    ttft_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)  # time to first token
+    duration_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)  # whole generation, wall clock
+    prompt_eval_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)  # as reported by Ollama
+    eval_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     chat: Mapped[Chat] = relationship(back_populates="messages")
 
+
+
+class CatalogRepo(Base):
+    """A GGUF repo of the local Hub catalog (app.services.hf_catalog), searchable offline."""
+
+    __tablename__ = "catalog_repos"
+    __table_args__ = (
+        UniqueConstraint("repo_id", name="uq_catalog_repos_repo_id"),
+        # SQLite gets an FTS5 table (catalog_repos_fts) at startup instead.
+        Index("ft_catalog_repos_search_text", "search_text", mysql_prefix="FULLTEXT").ddl_if(
+            dialect=("mysql", "mariadb")
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    repo_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    author: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    sha: Mapped[str | None] = mapped_column(String(64), nullable=True)  # file sizes are re-read when it changes
+    downloads: Mapped[int] = mapped_column(Integer, nullable=False, default=0, index=True)
+    likes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # From the Hub's GGUF summary of the repo
+    architecture: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    parameter_count: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    context_length: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    tags: Mapped[str] = mapped_column(Text, nullable=False, default="")  # comma-separated
+    search_text: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    last_modified: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    files: Mapped[list[CatalogFile]] = relationship(back_populates="repo", cascade="all, delete-orphan")
+
+
+class CatalogFile(Base):
+    __tablename__ = "catalog_files"
+    __table_args__ = (Index("ix_catalog_files_quantization_size", "quantization", "size_bytes"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    repo_id: Mapped[int] = mapped_column(ForeignKey("catalog_repos.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename: Mapped[str] = mapped_column(String(512), nullable=False)
+    size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    quantization: Mapped[str | None] = mapped_column(String(32), nullable=True)  # parsed from the filename
+
+    repo: Mapped[CatalogRepo] = relationship(back_populates="files")
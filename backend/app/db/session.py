@@ -1,13 +1,147 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.core.config import settings
 
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+def _async_database_url(url: str) -> str:
+    """Map the sync DATABASE_URL onto its asyncio driver (aiomysql / aiosqlite)."""
+    for sync_prefix, async_prefix in (
+        ("mysql+pymysql://", "mysql+aiomysql://"),
+        ("mysql://", "mysql+aiomysql://"),
+        ("mariadb+pymysql://", "mariadb+aiomysql://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+class _PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.waits = 0  # checkouts that found the pool exhausted and had to wait
+        self.timeouts = 0
+        self.wait_sec_total = 0.0
+        self.max_wait_sec = 0.0
+
+
+_pool_stats: dict[str, _PoolStats] = {}
+_pools: dict[str, object] = {}
+
+
+def _timed_pool(base: type, name: str) -> type:
+    """base with checkout latency and waits recorded under name (survives pool recreation)."""
+    stats = _pool_stats.setdefault(name, _PoolStats())
+
+    class TimedPool(base):
+        def _do_get(self):
+            max_overflow = getattr(self, "_max_overflow", -1)
+            exhausted = max_overflow >= 0 and self.checkedout() >= self.size() + max_overflow
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.checkouts += 1
+                if exhausted:
+                    stats.waits += 1
+                    stats.wait_sec_total += elapsed
+                    stats.max_wait_sec = max(stats.max_wait_sec, elapsed)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def _engine_kwargs(url: str, name: str, *, pool_size: int, max_overflow: int, is_async: bool) -> dict:
+    kwargs = {"pool_pre_ping": True}
+    if url.startswith("sqlite") and ":memory:" in url:
+        return kwargs  # single in-process connection, nothing to size
+    kwargs.update(
+        poolclass=_timed_pool(AsyncAdaptedQueuePool if is_async else QueuePool, name),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=settings.db_pool_recycle_sec,
+        pool_timeout=settings.db_pool_timeout_sec,
+    )
+    return kwargs
+
+
+def _sync_engine(name: str, pool_size: int, max_overflow: int):
+    url = settings.database_url
+    engine = create_engine(
+        url, **_engine_kwargs(url, name, pool_size=pool_size, max_overflow=max_overflow, is_async=False)
+    )
+    _pools[name] = engine
+    return engine
+
+
+def _async_engine(name: str, pool_size: int, max_overflow: int):
+    url = _async_database_url(settings.database_url)
+    engine = create_async_engine(
+        url, **_engine_kwargs(url, name, pool_size=pool_size, max_overflow=max_overflow, is_async=True)
+    )
+    _pools[name] = engine
+    return engine
+
+
+# Request handlers (threadpool routes).
+engine = _sync_engine("sync", settings.db_pool_size, settings.db_max_overflow)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by long-lived async endpoints (SSE streaming) so they never hold a threadpool worker.
+async_engine = _async_engine("async", settings.db_pool_size, settings.db_max_overflow)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Background writers (download threads, streamed reply flushes, preloads) get pools of their own,
+# so a burst of them cannot starve request handlers of connections and vice versa.
+background_engine = _sync_engine("background", settings.db_background_pool_size, settings.db_background_max_overflow)
+
+BackgroundSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
+
+async_background_engine = _async_engine(
+    "async_background", settings.db_background_pool_size, settings.db_background_max_overflow
+)
+
+AsyncBackgroundSessionLocal = async_sessionmaker(async_background_engine, autoflush=False, expire_on_commit=False)
+
+
+async def dispose_engines() -> None:
+    engine.dispose()
+    background_engine.dispose()
+    await async_engine.dispose()
+    await async_background_engine.dispose()
+
+
+def db_pool_stats() -> dict:
+    out = {}
+    for name, eng in _pools.items():
+        pool = eng.pool
+        entry = {"class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        stats = _pool_stats.get(name)
+        if stats is not None:
+            entry.update(
+                checkouts=stats.checkouts,
+                waits=stats.waits,
+                timeouts=stats.timeouts,
+                wait_sec_total=round(stats.wait_sec_total, 4),
+                max_wait_ms=round(stats.max_wait_sec * 1000, 2),
+            )
+        out[name] = entry
+    return out
+
 
 def get_db():
     db = SessionLocal()
@@ -16,3 +150,7 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
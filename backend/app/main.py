@@ -1,14 +1,41 @@
 import logging
+import threading
 
+import anyio.to_thread
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy import inspect, text
 
 from app.api.router import api_router
+from app.core.auth_cache import auth_cache_stats
 from app.core.config import settings
-from app.db.models import Base, ModelDownloadJob
-from app.db.session import SessionLocal, engine
+from app.core.metrics import MetricsMiddleware, render, sample_lines
+from app.core.security import password_hasher_stats
+from app.db.models import Base, Chat, Message, Model, ModelDownloadJob
+from app.db.session import db_pool_stats, dispose_engines, engine
+from app.services.context_window import prompt_reuse_stats
+from app.services.download_scheduler import (
+    download_scheduler_stats,
+    resume_interrupted_downloads,
+    start_download_scheduler,
+)
+from app.services.generation_runs import generation_runs_stats
+from app.services.generation_scheduler import generation_scheduler_stats
+from app.services.hf_cache import hf_cache_stats
+from app.services.hf_catalog import catalog_stats, ensure_search_index, start_catalog_refresher
+from app.services.hf_downloader import backfill_gguf_metadata
+from app.services.ollama_client import (
+    close_ollama_client,
+    generate_context_stats,
+    ollama_pool_stats,
+    ollama_registration_stats,
+    ollama_registry_stats,
+    open_ollama_client,
+)
+from app.services.message_writer import fail_interrupted_messages, message_writer_stats
+from app.services.progress_bus import progress_bus_stats
+from app.services.residency import residency_stats
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +59,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router)
 
 
@@ -46,6 +75,9 @@ def _apply_runtime_schema_fixes():
     if "model_download_jobs" in inspector.get_table_names() and "expected_bytes" not in columns:
         with engine.begin() as conn:
             conn.execute(text("ALTER TABLE model_download_jobs ADD COLUMN expected_bytes BIGINT NULL"))
+    if "model_download_jobs" in inspector.get_table_names() and "priority" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE model_download_jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0"))
 
     try:
         model_columns = {col["name"] for col in inspector.get_columns("models")}
@@ -64,31 +96,65 @@ def _apply_runtime_schema_fixes():
             alter_statements.append("ALTER TABLE models ADD COLUMN default_top_k INTEGER NULL")
         if "default_repeat_penalty" not in model_columns:
             alter_statements.append("ALTER TABLE models ADD COLUMN default_repeat_penalty DOUBLE NULL")
+        if "default_num_ctx" not in model_columns:
+            alter_statements.append("ALTER TABLE models ADD COLUMN default_num_ctx INTEGER NULL")
+        if "sha256" not in model_columns:
+            alter_statements.append("ALTER TABLE models ADD COLUMN sha256 VARCHAR(64) NULL")
+        if "architecture" not in model_columns:
+            alter_statements.append("ALTER TABLE models ADD COLUMN architecture VARCHAR(64) NULL")
+        if "context_length" not in model_columns:
+            alter_statements.append("ALTER TABLE models ADD COLUMN context_length INTEGER NULL")
+        if "quantization" not in model_columns:
+            alter_statements.append("ALTER TABLE models ADD COLUMN quantization VARCHAR(32) NULL")
+        if "parameter_count" not in model_columns:
+            alter_statements.append("ALTER TABLE models ADD COLUMN parameter_count BIGINT NULL")
+        if "chat_template" not in model_columns:
+            alter_statements.append("ALTER TABLE models ADD COLUMN chat_template TEXT NULL")
         if alter_statements:
             with engine.begin() as conn:
                 for stmt in alter_statements:
                     conn.execute(text(stmt))
 
+    try:
+        message_columns = {col["name"] for col in inspector.get_columns("messages")}
+    except Exception:
+        message_columns = set()
+
+    if "messages" in inspector.get_table_names() and "token_count" not in message_columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE messages ADD COLUMN token_count INTEGER NULL"))
+    if "messages" in inspector.get_table_names():
+        alter_statements = []
+        if "prompt_eval_count" not in message_columns:
+            alter_statements.append("ALTER TABLE messages ADD COLUMN prompt_eval_count INTEGER NULL")
+        if "status" not in message_columns:
+            alter_statements.append("ALTER TABLE messages ADD COLUMN status VARCHAR(16) NULL")
+        for column in ("ttft_ms", "duration_ms", "prompt_eval_ms", "eval_ms"):
+            if column not in message_columns:
+                alter_statements.append(f"ALTER TABLE messages ADD COLUMN {column} INTEGER NULL")
+        if alter_statements:
+            with engine.begin() as conn:
+                for stmt in alter_statements:
+                    conn.execute(text(stmt))
 
-def _reconcile_interrupted_downloads():
-    """Downloads do not survive backend restarts; mark them so UI stays honest."""
-    db = SessionLocal()
     try:
-        interrupted = (
-            db.query(ModelDownloadJob)
-            .filter(ModelDownloadJob.status.in_(("pending", "running")))
-            .all()
-        )
-        if not interrupted:
-            return
-        for job in interrupted:
-            job.status = "failed"
-            job.error = "Download interrupted by backend restart. Retry download."
-            if job.finished_at is None:
-                job.finished_at = job.started_at
-        db.commit()
-    finally:
-        db.close()
+        chat_columns = {col["name"] for col in inspector.get_columns("chats")}
+    except Exception:
+        chat_columns = set()
+
+    if "chats" in inspector.get_table_names() and "context_start_id" not in chat_columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE chats ADD COLUMN context_start_id INTEGER NULL"))
+
+    # Indexes added after the tables existed; create_all() only adds them to new tables.
+    for table in (Chat.__table__, Message.__table__, Model.__table__, ModelDownloadJob.__table__):
+        try:
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        except Exception:
+            continue
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
 
 
 @app.on_event("startup")
@@ -96,10 +162,128 @@ def on_startup():
     # MVP: auto-create tables so `docker compose up` works without running Alembic manually.
     Base.metadata.create_all(bind=engine)
     _apply_runtime_schema_fixes()
-    _reconcile_interrupted_downloads()
+    resume_interrupted_downloads()
+    fail_interrupted_messages()
+    ensure_search_index()
+    start_download_scheduler()
+    start_catalog_refresher()
+    threading.Thread(target=backfill_gguf_metadata, name="gguf-backfill", daemon=True).start()
+
+
+@app.on_event("startup")
+async def on_startup_ollama():
+    await open_ollama_client()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await close_ollama_client()
+    await dispose_engines()
 
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+
+@app.get("/health/stats")
+def health_stats():
+    """Runtime pool/cache counters used to size limits."""
+    return {
+        "ollama_pool": ollama_pool_stats(),
+        "db_pool": db_pool_stats(),
+        "ollama_registry": ollama_registry_stats(),
+        "ollama_registrations": ollama_registration_stats(),
+        "auth_cache": auth_cache_stats(),
+        "hf_cache": hf_cache_stats(),
+        "hf_catalog": catalog_stats(),
+        "password_hasher": password_hasher_stats(),
+        "downloads": download_scheduler_stats(),
+        "download_progress": progress_bus_stats(),
+        "residency": residency_stats(),
+        "generation": generation_scheduler_stats(),
+        "generation_runs": generation_runs_stats(),
+        "message_writer": message_writer_stats(),
+        "prompt_reuse": {**prompt_reuse_stats(), "generate_context": generate_context_stats()},
+    }
+
+
+
+def _scrape_time_metrics() -> list[str]:
+    """Samples from the in-memory *_stats() counters; reads no database."""
+    lines: list[str] = []
+    pools = db_pool_stats()
+    for name, kind, key, help_text in (
+        ("boom_db_pool_size", "gauge", "size", "Configured size of each DB connection pool."),
+        ("boom_db_pool_checked_out", "gauge", "checked_out", "Connections currently checked out."),
+        ("boom_db_pool_checkouts_total", "counter", "checkouts", "Connection checkouts."),
+        ("boom_db_pool_waits_total", "counter", "waits", "Checkouts that found the pool exhausted."),
+        ("boom_db_pool_timeouts_total", "counter", "timeouts", "Checkouts that timed out."),
+        ("boom_db_pool_wait_seconds_total", "counter", "wait_sec_total", "Time spent waiting for a connection."),
+    ):
+        lines += sample_lines(name, kind, help_text, [({"pool": p}, s.get(key)) for p, s in pools.items()])
+
+    # AnyIO's limiter is the threadpool sync routes (and run_in_threadpool) run in.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    lines += sample_lines(
+        "boom_threadpool_size", "gauge", "Worker threads available to sync routes.", [({}, limiter.total_tokens)]
+    )
+    lines += sample_lines("boom_threadpool_busy", "gauge", "Worker threads in use.", [({}, limiter.borrowed_tokens)])
+    waiting = limiter.statistics().tasks_waiting
+    lines += sample_lines("boom_threadpool_waiting", "gauge", "Calls waiting for a worker thread.", [({}, waiting)])
+    hashing = password_hasher_stats()["pending"]
+    lines += sample_lines("boom_password_hash_pending", "gauge", "bcrypt jobs queued or running.", [({}, hashing)])
+    ollama = ollama_pool_stats()
+    lines += sample_lines(
+        "boom_ollama_connections",
+        "gauge",
+        "Connections of the shared Ollama client by state.",
+        [({"state": state}, ollama.get(state)) for state in ("active", "idle", "queued")],
+    )
+
+    generation = generation_scheduler_stats()
+    lines += sample_lines(
+        "boom_generation_active",
+        "gauge",
+        "Generations holding a model slot.",
+        [({"model_id": m}, q["active"]) for m, q in generation["models"].items()],
+    )
+    lines += sample_lines(
+        "boom_generation_queued",
+        "gauge",
+        "Generations waiting for a model slot.",
+        [({"model_id": m}, q["queued"]) for m, q in generation["models"].items()],
+    )
+    lines += sample_lines(
+        "boom_generation_rejected_total", "counter", "Generations refused with 429.", [({}, generation["rejected"])]
+    )
+    outcomes = generation_runs_stats()["outcomes"]
+    lines += sample_lines(
+        "boom_generations_total",
+        "counter",
+        "Generations by how they ended.",
+        [({"outcome": o}, c["generations"]) for o, c in outcomes.items()],
+    )
+    lines += sample_lines(
+        "boom_generated_tokens_total",
+        "counter",
+        "Tokens generated, by how the generation ended.",
+        [({"outcome": o}, c["tokens"]) for o, c in outcomes.items()],
+    )
+
+    running = len(download_scheduler_stats()["running_job_ids"])
+    lines += sample_lines("boom_downloads_running", "gauge", "Download jobs in progress.", [({}, running)])
+    residency = residency_stats()
+    lines += sample_lines(
+        "boom_model_memory_bytes",
+        "gauge",
+        "Memory of models loaded in Ollama and the budget for it.",
+        [({"kind": "used"}, residency["used_bytes"]), ({"kind": "budget"}, residency["budget_bytes"])],
+    )
+    return lines
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format. Async so a saturated threadpool cannot block the scrape."""
+    return PlainTextResponse(render(_scrape_time_metrics()), media_type="text/plain; version=0.0.4; charset=utf-8")
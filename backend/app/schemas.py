@@ -27,6 +27,7 @@ class LoginIn(BaseModel):
 class ModelDownloadIn(BaseModel):
     hf_repo: str
     hf_filename: str
+    priority: int = 0  # higher runs first when DOWNLOAD_QUEUE_ORDER=priority
 
 
 class ModelOut(BaseModel):
@@ -35,11 +36,17 @@ class ModelOut(BaseModel):
     hf_filename: str
     local_path: str | None
     size_bytes: int | None
+    sha256: str | None = None
+    architecture: str | None = None
+    context_length: int | None = None
+    quantization: str | None = None
+    parameter_count: int | None = None
     default_temperature: float | None = None
     default_max_tokens: int | None = None
     default_top_p: float | None = None
     default_top_k: int | None = None
     default_repeat_penalty: float | None = None
+    default_num_ctx: int | None = None
     created_at: datetime
 
 
@@ -47,6 +54,7 @@ class ModelDownloadJobOut(BaseModel):
     id: int
     model_id: int
     status: str
+    priority: int = 0
     progress_bytes: int
     expected_bytes: int | None = None  # from Hugging Face file metadata (total size)
     error: str | None
@@ -54,12 +62,23 @@ class ModelDownloadJobOut(BaseModel):
     finished_at: datetime | None
 
 
+class ModelJobListOut(BaseModel):
+    jobs: list[ModelDownloadJobOut]  # newest first
+    next_cursor: int | None = None  # pass as before_id to get the next (older) page
+
+
+class ModelLibraryItemOut(ModelOut):
+    latest_job: ModelDownloadJobOut | None = None
+    loaded: bool | None = None  # None if Ollama could not be asked
+
+
 class ModelSettingsIn(BaseModel):
     temperature: float | None = Field(default=None, ge=0, le=2)
     num_predict: int | None = Field(default=None, ge=1, le=4096)
     top_p: float | None = Field(default=None, ge=0, le=1)
     top_k: int | None = Field(default=None, ge=1, le=100)
     repeat_penalty: float | None = Field(default=None, ge=1, le=2)
+    num_ctx: int | None = Field(default=None, ge=256, le=262144)
 
 
 class ModelParamsOut(BaseModel):
@@ -68,6 +87,7 @@ class ModelParamsOut(BaseModel):
     top_p: float | None = None
     top_k: int | None = None
     repeat_penalty: float | None = None
+    num_ctx: int | None = None
     source: str = "none"
 
 
@@ -83,6 +103,25 @@ class HfRepoFile(BaseModel):
     filename: str
 
 
+class HfCatalogFile(BaseModel):
+    filename: str
+    size_bytes: int | None = None
+    quantization: str | None = None
+
+
+class HfCatalogRepo(BaseModel):
+    repo_id: str
+    author: str | None = None
+    downloads: int
+    likes: int
+    architecture: str | None = None
+    parameter_count: int | None = None
+    context_length: int | None = None
+    tags: list[str] = []
+    last_modified: datetime | None = None
+    files: list[HfCatalogFile] = []
+
+
 class ChatCreateIn(BaseModel):
     model_id: int
     title: str | None = None
@@ -109,6 +148,9 @@ class MessageOut(BaseModel):
     role: str
     content: str
     tokens_used: int | None = None
+    status: str | None = None  # "streaming" / "failed" / "cancelled" for unfinished assistant replies
+    ttft_ms: int | None = None
+    duration_ms: int | None = None
     created_at: datetime
 
     @field_serializer("created_at")
@@ -116,9 +158,15 @@ class MessageOut(BaseModel):
         return dt.isoformat()
 
 
+class ChatListOut(BaseModel):
+    chats: list[ChatOut]
+    next_cursor: int | None = None  # pass as before_id to get the next (older) page
+
+
 class ChatDetailOut(BaseModel):
     chat: ChatOut
-    messages: list[MessageOut]
+    messages: list[MessageOut]  # oldest first within the page
+    next_cursor: int | None = None  # pass as before_id to get older messages
 
 
 class MessageCreateIn(BaseModel):
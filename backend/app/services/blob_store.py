@@ -0,0 +1,112 @@
+"""Content-addressed store for downloaded GGUF files.
+
+Every verified file is kept once as MODELS_DIR/blobs/sha256-<hex>; the per-repo paths models point
+at are hardlinks to it (reflinks where hardlinks are unavailable), so identical weights published
+under several repos or file names use disk space once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+
+from app.core.config import settings
+
+_READ_BYTES = 8 * 1024 * 1024
+_FICLONE = 0x40049409  # linux/fs.h
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def blobs_dir() -> str:
+    return os.path.join(settings.models_dir, "blobs")
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(blobs_dir(), f"sha256-{sha256}")
+
+
+def hub_sha256(meta) -> str | None:
+    """SHA-256 the Hub reports for a file: the etag of LFS files (plain git files carry a sha1)."""
+    etag = (getattr(meta, "etag", None) or "").strip().removeprefix("W/").strip('"').lower()
+    return etag if _SHA256_RE.match(etag) else None
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_READ_BYTES):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _reflink(src: str, dst: str) -> None:
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+
+
+def _link(src: str, dst: str) -> None:
+    """Make dst share src's data: hardlink, else reflink. Raises OSError if neither works."""
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        _reflink(src, dst)
+    except (OSError, ImportError) as e:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        raise OSError(f"Cannot link {src} -> {dst}") from e
+
+
+def link_from_store(sha256: str, dest: str) -> bool:
+    """Materialise dest from a stored blob. False when the store has no such blob (or cannot link)."""
+    src = blob_path(sha256)
+    if not os.path.isfile(src):
+        return False
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    tmp = f"{dest}.link"
+    try:
+        _link(src, tmp)
+    except OSError:
+        return False
+    os.replace(tmp, dest)
+    return True
+
+
+def adopt(path: str, sha256: str) -> None:
+    """Put a verified file into the store, keeping path as a link to it.
+
+    If the content is already stored, path is replaced with a link to the existing blob and the
+    duplicate copy is dropped. When the filesystem supports neither hardlinks nor reflinks the file
+    simply stays outside the store.
+    """
+    os.makedirs(blobs_dir(), exist_ok=True)
+    blob = blob_path(sha256)
+    if os.path.isfile(blob):
+        if not os.path.samefile(blob, path):
+            link_from_store(sha256, path)
+        return
+    try:
+        _link(path, blob)
+    except OSError:
+        pass
+
+
+def release(sha256: str) -> None:
+    """Drop a stored blob once no model path is hardlinked to it any more.
+
+    Reflinked copies are independent inodes that share extents in the filesystem, so their blob
+    (link count 1) can go at any time without freeing or breaking anything.
+    """
+    blob = blob_path(sha256)
+    try:
+        if os.stat(blob).st_nlink <= 1:
+            os.unlink(blob)
+    except OSError:
+        pass
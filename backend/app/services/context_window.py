@@ -0,0 +1,138 @@
+"""Token-budgeted selection of chat history for a generation request.
+
+The history window of a chat starts at a remembered message (Chat.context_start_id) and only grows
+at the end, so consecutive turns send a byte-identical prefix and Ollama can reuse its KV cache for
+it. When the budget runs out the start moves forward by a whole block at once instead of one
+message per turn.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import asc, desc, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Chat, Message, Model
+
+# Role markers / separators the chat template adds around every message.
+_MESSAGE_OVERHEAD_TOKENS = 4
+# Rows scanned per round trip while walking history newest-first.
+_SCAN_BATCH = 64
+# Share of the budget the history keeps after the window start has moved; the rest is room for the
+# following turns to grow into without touching the prefix.
+_SLIDE_KEEP_RATIO = 0.5
+
+_prompt_stats = {"turns": 0, "prompt_tokens": 0, "prompt_eval_tokens": 0, "window_slides": 0}
+
+
+def estimate_tokens(text: str, eval_count: int | None = None) -> int:
+    """Prompt-side size of one message.
+
+    Uses Ollama's eval_count when known (assistant replies), otherwise ~4 UTF-8 bytes per token,
+    which slightly overestimates Cyrillic text and is close for English.
+    """
+    if eval_count:
+        return eval_count + _MESSAGE_OVERHEAD_TOKENS
+    return len(text.encode("utf-8")) // 4 + 1 + _MESSAGE_OVERHEAD_TOKENS
+
+
+def model_num_ctx(model: Model) -> int:
+    """Context window used for generation: the saved setting or the default, capped at what the
+    model was trained for (GGUF context_length)."""
+    num_ctx = model.default_num_ctx or settings.default_num_ctx
+    if model.context_length:
+        num_ctx = min(num_ctx, model.context_length)
+    return num_ctx
+
+
+def history_budget(model: Model, *, max_tokens: int | None, system_prompt: str | None) -> int:
+    """Tokens left for chat history once the reply and system prompt are reserved."""
+    num_ctx = model_num_ctx(model)
+    reply = min(max_tokens or settings.context_reply_reserve_tokens, num_ctx // 2)
+    system = estimate_tokens(system_prompt) if system_prompt else 0
+    return max(num_ctx - reply - system, 0)
+
+
+async def select_context_messages(db: AsyncSession, chat: Chat, last_message_id: int, budget: int) -> list[Message]:
+    """Messages of a chat from its window start up to last_message_id, oldest first.
+
+    If they no longer fit into budget tokens, the window start moves to the oldest of the newest
+    messages that fit into half of it and is saved on the chat. Only (id, token_count) is scanned;
+    content is loaded for the chosen rows and for legacy rows whose token_count has not been cached
+    yet (those are backfilled here).
+    """
+    start = chat.context_start_id or 0
+    if start > last_message_id:
+        start = 0
+    chosen: list[tuple[int, int]] = []  # (id, token_count), newest first
+    backfill: list[dict] = []
+    used = 0
+    cursor = last_message_id
+    full = False
+    while not full:
+        rows = (
+            await db.execute(
+                select(Message.id, Message.token_count, Message.tokens_used)
+                .where(Message.chat_id == chat.id, Message.id >= start, Message.id <= cursor)
+                .order_by(desc(Message.id))
+                .limit(_SCAN_BATCH)
+            )
+        ).all()
+        if not rows:
+            break
+
+        missing = [r.id for r in rows if r.token_count is None]
+        contents: dict[int, str] = {}
+        if missing:
+            contents = dict((await db.execute(select(Message.id, Message.content).where(Message.id.in_(missing)))).all())
+
+        for row in rows:
+            count = row.token_count
+            if count is None:
+                count = estimate_tokens(contents.get(row.id) or "", row.tokens_used)
+                backfill.append({"id": row.id, "token_count": count})
+            # The latest message is always sent, even if it alone exceeds the budget.
+            if chosen and used + count > budget:
+                full = True
+                break
+            used += count
+            chosen.append((row.id, count))
+
+        if len(rows) < _SCAN_BATCH:
+            break
+        cursor = rows[-1].id - 1
+
+    if full:
+        keep = budget * _SLIDE_KEEP_RATIO
+        kept = 0
+        for n, (_, count) in enumerate(chosen):
+            if n and kept + count > keep:
+                del chosen[n:]
+                break
+            kept += count
+        chat.context_start_id = chosen[-1][0]
+        _prompt_stats["window_slides"] += 1
+
+    if backfill:
+        await db.execute(update(Message), backfill)
+    if backfill or full:
+        await db.commit()
+
+    if not chosen:
+        return []
+    ids = [message_id for message_id, _ in chosen]
+    return list((await db.scalars(select(Message).where(Message.id.in_(ids)).order_by(asc(Message.id)))).all())
+
+
+def record_prompt_eval(prompt_tokens: int, prompt_eval_count: int) -> None:
+    """Account one turn: estimated prompt size vs. tokens Ollama actually evaluated (the rest came
+    from its cache)."""
+    _prompt_stats["turns"] += 1
+    _prompt_stats["prompt_tokens"] += prompt_tokens
+    _prompt_stats["prompt_eval_tokens"] += prompt_eval_count
+
+
+def prompt_reuse_stats() -> dict:
+    total = _prompt_stats["prompt_tokens"]
+    evaluated = min(_prompt_stats["prompt_eval_tokens"], total)
+    return {**_prompt_stats, "reuse_ratio": round(1 - evaluated / total, 3) if total else None}
@@ -0,0 +1,115 @@
+"""DB-backed download queue: runs pending ModelDownloadJob rows with a concurrency limit.
+
+The jobs table is the queue, so nothing is lost on restart: interrupted jobs are put back to
+pending and resume from their .incomplete file.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+
+from sqlalchemy import asc, desc, select, update
+
+from app.core.config import settings
+from app.db.models import ModelDownloadJob
+from app.db.session import BackgroundSessionLocal
+from app.services.hf_downloader import register_cancel_event, run_download_job
+
+logger = logging.getLogger(__name__)
+
+_POLL_INTERVAL_SEC = 5.0
+
+_wake = threading.Event()
+_running: dict[int, threading.Thread] = {}
+_running_lock = threading.Lock()
+_dispatcher: threading.Thread | None = None
+
+
+def enqueue_download_job(job_id: int) -> None:
+    """The job row is already pending; wake the dispatcher so it starts as soon as a slot is free."""
+    _wake.set()
+
+
+def resume_interrupted_downloads() -> None:
+    """Put jobs that were running when the backend stopped back into the queue (progress is kept)."""
+    db = BackgroundSessionLocal()
+    try:
+        db.execute(
+            update(ModelDownloadJob)
+            .where(ModelDownloadJob.status == "running")
+            .values(status="pending", error=None, finished_at=None)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def start_download_scheduler() -> None:
+    global _dispatcher
+    if _dispatcher is not None and _dispatcher.is_alive():
+        return
+    _dispatcher = threading.Thread(target=_dispatch_loop, name="download-scheduler", daemon=True)
+    _dispatcher.start()
+    _wake.set()
+
+
+def download_scheduler_stats() -> dict:
+    with _running_lock:
+        running = sorted(_running)
+    return {
+        "max_concurrent": settings.download_max_concurrent,
+        "order": settings.download_queue_order,
+        "running_job_ids": running,
+    }
+
+
+def _queue_order():
+    if settings.download_queue_order == "priority":
+        return (desc(ModelDownloadJob.priority), asc(ModelDownloadJob.id))
+    return (asc(ModelDownloadJob.id),)
+
+
+def _dispatch_loop() -> None:
+    while True:
+        _wake.wait(_POLL_INTERVAL_SEC)
+        _wake.clear()
+        try:
+            _fill_slots()
+        except Exception:
+            logger.exception("Download scheduler pass failed")
+
+
+def _fill_slots() -> None:
+    with _running_lock:
+        for job_id in [j for j, t in _running.items() if not t.is_alive()]:
+            _running.pop(job_id, None)
+        free = settings.download_max_concurrent - len(_running)
+        busy = set(_running)
+    if free <= 0:
+        return
+
+    db = BackgroundSessionLocal()
+    try:
+        stmt = select(ModelDownloadJob.id).where(ModelDownloadJob.status == "pending")
+        if busy:
+            stmt = stmt.where(ModelDownloadJob.id.not_in(busy))
+        job_ids = db.scalars(stmt.order_by(*_queue_order()).limit(free)).all()
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        register_cancel_event(job_id)
+        t = threading.Thread(target=_run_and_release, args=(job_id,), name=f"download-{job_id}", daemon=True)
+        with _running_lock:
+            _running[job_id] = t
+        t.start()
+
+
+def _run_and_release(job_id: int) -> None:
+    try:
+        run_download_job(job_id)
+    finally:
+        with _running_lock:
+            _running.pop(job_id, None)
+        _wake.set()
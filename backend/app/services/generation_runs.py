@@ -0,0 +1,184 @@
+"""Chat generations that outlive the HTTP connection which started them.
+
+A generation runs as a task on the app loop and publishes its SSE events into a bounded ring
+buffer; connections only listen. Event ids are "<generation id>:<seq>", so a client that
+reconnects with Last-Event-ID gets the events it missed replayed and then follows the live
+stream, without running inference again. A generation nobody listens to for
+GENERATION_DETACH_GRACE_SEC is stopped (cancelling the task closes the Ollama stream, which makes
+Ollama stop generating), and a finished one stays attachable that long.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import secrets
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from app.core.config import settings
+
+_generations: dict[str, Generation] = {}
+# (chat_id, after_message_id) -> generation id: a repeated request for the same turn attaches.
+_by_turn: dict[tuple[int, int], str] = {}
+_stats = {"started": 0, "reattached": 0, "replayed_events": 0, "resyncs": 0, "abandoned": 0, "cancelled_by_user": 0}
+# Generations and generated tokens by how they ended: how much compute went into replies nobody got.
+_outcomes = {outcome: {"generations": 0, "tokens": 0} for outcome in ("completed", "cancelled", "failed")}
+
+
+class Generation:
+    def __init__(self, chat_id: int, after_message_id: int, user_id: int):
+        self.id = secrets.token_hex(8)
+        self.chat_id = chat_id
+        self.after_message_id = after_message_id
+        self.user_id = user_id
+        self.seq = 0
+        self.events: deque[tuple[int, str, str]] = deque(maxlen=settings.generation_replay_events)
+        self._text: list[str] = []  # data of every "token" event, for resyncs
+        self.finished = False
+        self.task: asyncio.Task | None = None
+        self.listeners = 0
+        self.detached_at: float | None = time.monotonic()
+        self._wakeup = asyncio.Event()
+
+    def emit(self, event: str, data: str = "") -> None:
+        self.seq += 1
+        self.events.append((self.seq, event, data))
+        if event == "token":
+            self._text.append(data)
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def _finish(self) -> None:
+        self.finished = True
+        self._wakeup.set()
+        _forget_later(self)
+
+    async def listen(self, after_seq: int = 0):
+        """Yield (event id, event, data) after after_seq until the generation ends.
+
+        If some of the missed events have already left the ring buffer, a "resync" event comes
+        instead of the replay. Its data is the whole text streamed so far: the client replaces its
+        copy of the reply with it and goes on appending the live tokens. The persisted message is
+        not used for this, since it lags the stream by the unflushed tail.
+        """
+        self.listeners += 1
+        self.detached_at = None
+        try:
+            if self.events and after_seq < self.events[0][0] - 1:
+                _stats["resyncs"] += 1
+                after_seq = self.seq
+                yield f"{self.id}:{after_seq}", "resync", "".join(self._text)
+            elif after_seq:
+                _stats["replayed_events"] += self.seq - after_seq
+            while True:
+                wakeup = self._wakeup
+                for seq, event, data in list(self.events):
+                    if seq > after_seq:
+                        after_seq = seq
+                        yield f"{self.id}:{seq}", event, data
+                if self.finished and after_seq >= self.seq:
+                    return
+                if after_seq >= self.seq:
+                    await wakeup.wait()
+        finally:
+            self.listeners -= 1
+            if not self.listeners:
+                self.detached_at = time.monotonic()
+                self.watch_abandoned()
+
+    def watch_abandoned(self) -> None:
+        """Stop the generation if it still has no listener after the grace period.
+
+        Also armed whenever a response is handed out, since a client that disconnects before the
+        response starts iterating never reaches listen().
+        """
+        if not self.finished:
+            loop = asyncio.get_running_loop()
+            loop.call_later(settings.generation_detach_grace_sec, self._stop_if_abandoned)
+
+    def _stop_if_abandoned(self) -> None:
+        if self.finished or self.listeners or self.task is None or self.detached_at is None:
+            return
+        if time.monotonic() - self.detached_at >= settings.generation_detach_grace_sec:
+            _stats["abandoned"] += 1
+            self.task.cancel()
+
+
+def _forget_later(generation: Generation) -> None:
+    def forget():
+        _generations.pop(generation.id, None)
+        key = (generation.chat_id, generation.after_message_id)
+        if _by_turn.get(key) == generation.id:
+            _by_turn.pop(key, None)
+
+    asyncio.get_running_loop().call_later(settings.generation_detach_grace_sec, forget)
+
+
+def start_generation(
+    chat_id: int, after_message_id: int, user_id: int, run: Callable[[Generation], Awaitable[None]]
+) -> Generation:
+    """Run run(generation) in the background; it publishes through generation.emit()."""
+    generation = Generation(chat_id, after_message_id, user_id)
+
+    async def runner():
+        try:
+            await run(generation)
+        finally:
+            generation._finish()
+
+    _generations[generation.id] = generation
+    _by_turn[(chat_id, after_message_id)] = generation.id
+    generation.task = asyncio.get_running_loop().create_task(runner())
+    generation.watch_abandoned()
+    _stats["started"] += 1
+    return generation
+
+
+def find_generation(last_event_id: str) -> tuple[Generation, int] | None:
+    """Generation and seq named by a Last-Event-ID header, if it is still known."""
+    generation_id, _, seq = last_event_id.strip().partition(":")
+    generation = _generations.get(generation_id)
+    if generation is None or not seq.isdigit():
+        return None
+    _stats["reattached"] += 1
+    return generation, int(seq)
+
+
+def generation_for_turn(chat_id: int, after_message_id: int) -> Generation | None:
+    generation_id = _by_turn.get((chat_id, after_message_id))
+    generation = _generations.get(generation_id) if generation_id else None
+    if generation is not None:
+        _stats["reattached"] += 1
+    return generation
+
+
+def cancel_chat_generations(chat_id: int) -> int:
+    """Stop the running generations of a chat; returns how many were stopped."""
+    cancelled = 0
+    for generation in list(_generations.values()):
+        if generation.chat_id == chat_id and not generation.finished and generation.task is not None:
+            generation.task.cancel()
+            cancelled += 1
+    _stats["cancelled_by_user"] += cancelled
+    return cancelled
+
+
+def record_outcome(outcome: str, tokens: int) -> None:
+    """outcome is "completed", "cancelled" or "failed"; tokens generated up to that point."""
+    _outcomes[outcome]["generations"] += 1
+    _outcomes[outcome]["tokens"] += tokens
+
+
+def generation_runs_stats() -> dict:
+    total_tokens = sum(o["tokens"] for o in _outcomes.values())
+    wasted = _outcomes["cancelled"]["tokens"] + _outcomes["failed"]["tokens"]
+    return {
+        "live": sum(1 for g in _generations.values() if not g.finished),
+        "retained": sum(1 for g in _generations.values() if g.finished),
+        "listeners": sum(g.listeners for g in _generations.values()),
+        "grace_sec": settings.generation_detach_grace_sec,
+        **_stats,
+        "outcomes": {outcome: dict(counts) for outcome, counts in _outcomes.items()},
+        "wasted_token_ratio": round(wasted / total_tokens, 3) if total_tokens else None,
+    }
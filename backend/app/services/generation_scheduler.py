@@ -0,0 +1,162 @@
+"""Admission control and fair queuing of chat generations in front of Ollama.
+
+Each model gets GENERATION_SLOTS_PER_MODEL concurrent generations. Further requests wait in a
+per-model queue that is served round-robin across users, so one user with several tabs cannot
+starve everybody else. When the queue is full a request is rejected up front (429 + Retry-After)
+instead of piling up inside Ollama where its wait is invisible.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+
+from app.core.config import settings
+
+# Assumed generation length until the first ones on a model have finished.
+_DEFAULT_DURATION_SEC = 30.0
+_DURATION_EMA_ALPHA = 0.2
+
+
+class GenerationQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many generations in progress, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class GenerationTicket:
+    """A request's place in its model's queue; release() it when the generation ends."""
+
+    def __init__(self, model_id: int, user_id: int):
+        self.model_id = model_id
+        self.user_id = user_id
+        self.granted = False
+        self.released = False
+        self.enqueued_at = time.monotonic()
+        self.granted_at: float | None = None
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        """Yield the 1-based queue position whenever it changes; returns once a slot is granted."""
+        last = None
+        while not self.granted:
+            # Cleared before reading the state: a change while the caller handles a position is kept.
+            self._changed.clear()
+            position = _queues[self.model_id].position(self)
+            if position != last:
+                last = position
+                yield position
+            if not self.granted:
+                await self._changed.wait()
+
+    def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        queue = _queues[self.model_id]
+        if self.granted:
+            queue.active -= 1
+            duration = time.monotonic() - (self.granted_at or self.enqueued_at)
+            queue.avg_duration += _DURATION_EMA_ALPHA * (duration - queue.avg_duration)
+        else:
+            waiting = queue.waiting.get(self.user_id)
+            if waiting is not None and self in waiting:
+                waiting.remove(self)
+                if not waiting:
+                    del queue.waiting[self.user_id]
+            _stats["abandoned"] += 1
+        queue.dispatch()
+
+
+class _ModelQueue:
+    def __init__(self):
+        self.active = 0
+        # user_id -> waiting tickets; the dict order is the round-robin order of users.
+        self.waiting: dict[int, deque[GenerationTicket]] = {}
+        self.avg_duration = _DEFAULT_DURATION_SEC
+
+    def queued(self) -> int:
+        return sum(len(tickets) for tickets in self.waiting.values())
+
+    def order(self) -> list[GenerationTicket]:
+        """Waiting tickets in the order they will get a slot: one per user per round."""
+        queues = list(self.waiting.values())
+        order: list[GenerationTicket] = []
+        for i in range(max((len(q) for q in queues), default=0)):
+            order.extend(q[i] for q in queues if i < len(q))
+        return order
+
+    def position(self, ticket: GenerationTicket) -> int:
+        return self.order().index(ticket) + 1
+
+    def retry_after(self) -> int:
+        waves = (self.queued() + 1) / settings.generation_slots_per_model
+        return max(1, math.ceil(self.avg_duration * waves))
+
+    def dispatch(self) -> None:
+        now = time.monotonic()
+        while self.active < settings.generation_slots_per_model and self.waiting:
+            user_id = next(iter(self.waiting))
+            tickets = self.waiting.pop(user_id)
+            ticket = tickets.popleft()
+            if tickets:
+                self.waiting[user_id] = tickets  # back of the round
+            self._grant(ticket, now)
+            _stats["wait_sec_total"] += now - ticket.enqueued_at
+        # Everybody still waiting moved up.
+        for tickets in self.waiting.values():
+            for ticket in tickets:
+                ticket._changed.set()
+
+    def _grant(self, ticket: GenerationTicket, now: float) -> None:
+        ticket.granted = True
+        ticket.granted_at = now
+        self.active += 1
+        ticket._changed.set()
+
+
+_queues: dict[int, _ModelQueue] = {}
+_stats = {"admitted": 0, "queued": 0, "rejected": 0, "abandoned": 0, "wait_sec_total": 0.0}
+
+
+def reserve_generation(model_id: int, user_id: int) -> GenerationTicket:
+    """Take a slot or a place in the queue for one generation. Must run on the event loop.
+
+    Raises GenerationQueueFull when the model's queue, or the user's share of it, is full.
+    """
+    queue = _queues.setdefault(model_id, _ModelQueue())
+    ticket = GenerationTicket(model_id, user_id)
+    if queue.active < settings.generation_slots_per_model and not queue.waiting:
+        queue._grant(ticket, ticket.enqueued_at)
+        _stats["admitted"] += 1
+        return ticket
+    if (
+        queue.queued() >= settings.generation_queue_max
+        or len(queue.waiting.get(user_id, ())) >= settings.generation_queue_per_user
+    ):
+        _stats["rejected"] += 1
+        raise GenerationQueueFull(queue.retry_after())
+    queue.waiting.setdefault(user_id, deque()).append(ticket)
+    _stats["admitted"] += 1
+    _stats["queued"] += 1
+    return ticket
+
+
+def generation_scheduler_stats() -> dict:
+    return {
+        "slots_per_model": settings.generation_slots_per_model,
+        "queue_max": settings.generation_queue_max,
+        **_stats,
+        "wait_sec_total": round(_stats["wait_sec_total"], 3),
+        "models": {
+            model_id: {
+                "active": queue.active,
+                "queued": queue.queued(),
+                "avg_duration_sec": round(queue.avg_duration, 2),
+            }
+            for model_id, queue in _queues.items()
+            if queue.active or queue.waiting
+        },
+    }
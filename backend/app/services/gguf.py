@@ -0,0 +1,212 @@
+"""GGUF header reader.
+
+Memory-maps the file and walks only the metadata key/value section and the tensor index, so the
+page cache is touched for a few MB of header at most and tensor data is never read. Values that
+are not needed (token vocabularies, merges) are skipped by length without being decoded.
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+from collections import Counter
+
+_MAGIC = b"GGUF"
+
+# GGUF metadata value types
+_STRING = 8
+_ARRAY = 9
+_SCALAR_FORMATS = {
+    0: "<B",
+    1: "<b",
+    2: "<H",
+    3: "<h",
+    4: "<I",
+    5: "<i",
+    6: "<f",
+    7: "<?",
+    10: "<Q",
+    11: "<q",
+    12: "<d",
+}
+
+# general.file_type (llama_ftype)
+_FILE_TYPES = {
+    0: "F32",
+    1: "F16",
+    2: "Q4_0",
+    3: "Q4_1",
+    7: "Q8_0",
+    8: "Q5_0",
+    9: "Q5_1",
+    10: "Q2_K",
+    11: "Q3_K_S",
+    12: "Q3_K_M",
+    13: "Q3_K_L",
+    14: "Q4_K_S",
+    15: "Q4_K_M",
+    16: "Q5_K_S",
+    17: "Q5_K_M",
+    18: "Q6_K",
+    19: "IQ2_XXS",
+    20: "IQ2_XS",
+    21: "Q2_K_S",
+    22: "IQ3_XS",
+    23: "IQ3_XXS",
+    24: "IQ1_S",
+    25: "IQ4_NL",
+    26: "IQ3_S",
+    27: "IQ3_M",
+    28: "IQ2_S",
+    29: "IQ2_M",
+    30: "IQ4_XS",
+    31: "IQ1_M",
+    32: "BF16",
+    36: "TQ1_0",
+    37: "TQ2_0",
+}
+
+# Tensor types (ggml_type), used when the file does not declare general.file_type
+_TENSOR_TYPES = {
+    0: "F32",
+    1: "F16",
+    2: "Q4_0",
+    3: "Q4_1",
+    6: "Q5_0",
+    7: "Q5_1",
+    8: "Q8_0",
+    9: "Q8_1",
+    10: "Q2_K",
+    11: "Q3_K",
+    12: "Q4_K",
+    13: "Q5_K",
+    14: "Q6_K",
+    15: "Q8_K",
+    16: "IQ2_XXS",
+    17: "IQ2_XS",
+    18: "IQ3_XXS",
+    19: "IQ1_S",
+    20: "IQ4_NL",
+    21: "IQ3_S",
+    22: "IQ2_S",
+    23: "IQ4_XS",
+    29: "IQ1_M",
+    30: "BF16",
+    34: "TQ1_0",
+    35: "TQ2_0",
+}
+
+
+class GgufFormatError(ValueError):
+    pass
+
+
+class _Reader:
+    def __init__(self, buf, version: int):
+        self.buf = buf
+        self.pos = 0
+        # GGUF v1 used 32-bit lengths and counts.
+        self.len_format = "<I" if version == 1 else "<Q"
+
+    def unpack(self, fmt: str):
+        try:
+            (value,) = struct.unpack_from(fmt, self.buf, self.pos)
+        except struct.error as e:
+            raise GgufFormatError("Truncated GGUF header") from e
+        self.pos += struct.calcsize(fmt)
+        return value
+
+    def length(self) -> int:
+        return self.unpack(self.len_format)
+
+    def string(self) -> str:
+        n = self.length()
+        if self.pos + n > len(self.buf):
+            raise GgufFormatError("Truncated GGUF string")
+        value = self.buf[self.pos : self.pos + n].decode("utf-8", errors="replace")
+        self.pos += n
+        return value
+
+    def skip_string(self) -> None:
+        n = self.length()
+        self.pos += n
+
+    def value(self, vtype: int, keep: bool):
+        """Read one value; when keep is False only advance past it and return None."""
+        if vtype == _STRING:
+            if keep:
+                return self.string()
+            self.skip_string()
+            return None
+        if vtype == _ARRAY:
+            item_type = self.unpack("<I")
+            count = self.length()
+            if item_type in _SCALAR_FORMATS:
+                self.pos += count * struct.calcsize(_SCALAR_FORMATS[item_type])
+            else:
+                for _ in range(count):
+                    self.value(item_type, False)
+            return None
+        fmt = _SCALAR_FORMATS.get(vtype)
+        if fmt is None:
+            raise GgufFormatError(f"Unknown GGUF value type {vtype}")
+        return self.unpack(fmt)
+
+
+def _wanted_key(key: str) -> bool:
+    return key in ("general.architecture", "general.file_type", "tokenizer.chat_template") or key.endswith(
+        ".context_length"
+    )
+
+
+def read_gguf_metadata(path: str) -> dict:
+    """Model metadata from a GGUF header, keyed by the matching Model columns.
+
+    Returns architecture, context_length, quantization, parameter_count and chat_template
+    (None for whatever the file does not declare). Raises GgufFormatError for non-GGUF files.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        if buf[:4] != _MAGIC:
+            raise GgufFormatError("Not a GGUF file")
+        (version,) = struct.unpack_from("<I", buf, 4)
+        r = _Reader(buf, version)
+        r.pos = 8
+        tensor_count = r.length()
+        kv_count = r.length()
+
+        kv: dict = {}
+        for _ in range(kv_count):
+            key = r.string()
+            vtype = r.unpack("<I")
+            keep = _wanted_key(key)
+            value = r.value(vtype, keep)
+            if keep:
+                kv[key] = value
+
+        parameter_count = 0
+        elements_by_type: Counter = Counter()
+        for _ in range(tensor_count):
+            r.skip_string()
+            n_dims = r.unpack("<I")
+            elements = 1
+            for _ in range(n_dims):
+                elements *= r.length()
+            tensor_type = r.unpack("<I")
+            r.pos += 8  # data offset
+            parameter_count += elements
+            if n_dims >= 2:
+                elements_by_type[tensor_type] += elements
+
+    architecture = kv.get("general.architecture")
+    context_length = kv.get(f"{architecture}.context_length") if architecture else None
+    quantization = _FILE_TYPES.get(kv.get("general.file_type"))
+    if quantization is None and elements_by_type:
+        # Quantized files keep norms etc. in F32; the bulk of matrix weights names the quantization.
+        quantization = _TENSOR_TYPES.get(elements_by_type.most_common(1)[0][0])
+    return {
+        "architecture": architecture,
+        "context_length": int(context_length) if context_length else None,
+        "quantization": quantization,
+        "parameter_count": parameter_count or None,
+        "chat_template": kv.get("tokenizer.chat_template") or None,
+    }
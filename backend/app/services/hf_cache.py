@@ -0,0 +1,148 @@
+"""Response cache for Hugging Face Hub lookups (model search, repo file lists).
+
+TTL + LRU, with single-flight loading: concurrent identical requests wait for one Hub call
+instead of each making their own. Entries past their TTL are still served for a while
+(stale-while-revalidate) and refreshed in the background, so a slow Hub only ever delays the
+first request for a key.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.core.config import settings
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+
+class _SwrCache:
+    """Thread-safe: sync routes call it from the threadpool."""
+
+    def __init__(self, name: str, maxsize: int, ttl_sec: float, stale_sec: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self.stale_sec = stale_sec
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._items: OrderedDict = OrderedDict()  # key -> (fresh_until, value)
+        self._flights: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, load: Callable[[], object]):
+        """Cached value for key; load() runs at most once at a time per key."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                fresh_until, value = item
+                if now < fresh_until:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < fresh_until + self.stale_sec:
+                    self._items.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._flights:
+                        self._flights[key] = _Flight()
+                        _refresher.submit(self._refresh, key, load)
+                    return value
+                del self._items[key]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = load()
+            self._put(key, flight.value)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _refresh(self, key, load: Callable[[], object]) -> None:
+        flight = self._flights.get(key)
+        try:
+            value = load()
+            self._put(key, value)
+            self.refreshes += 1
+            if flight is not None:
+                flight.value = value
+        except Exception as e:
+            # The stale value keeps being served until it expires for good.
+            self.refresh_errors += 1
+            if flight is not None:
+                flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            if flight is not None:
+                flight.done.set()
+
+    def _put(self, key, value) -> None:
+        if self.maxsize <= 0 or self.ttl_sec <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_sec, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hf-cache-refresh")
+
+# (q, limit) -> list[HfModelSummary]; (repo_id, only_gguf) -> list[HfRepoFile]
+search_cache = _SwrCache("search", settings.hf_cache_size, settings.hf_cache_ttl_sec, settings.hf_cache_stale_sec)
+repo_files_cache = _SwrCache(
+    "repo_files", settings.hf_cache_size, settings.hf_cache_ttl_sec, settings.hf_cache_stale_sec
+)
+
+
+def hf_cache_stats() -> dict:
+    return {
+        "ttl_sec": settings.hf_cache_ttl_sec,
+        "stale_sec": settings.hf_cache_stale_sec,
+        "search": search_cache.stats(),
+        "repo_files": repo_files_cache.stats(),
+    }
@@ -0,0 +1,324 @@
+"""Local catalog of the most downloaded GGUF repos on the Hub, refreshed in the background.
+
+A refresh pass lists the top HF_CATALOG_MAX_REPOS GGUF repos in one paginated call (architecture and
+parameter count come from the Hub's GGUF summary); file sizes are only re-read for repos whose
+commit changed since the previous pass. /hf/catalog then answers from the database alone, so it
+works offline and can filter on things the Hub search cannot: quantization, file size, architecture
+and parameter count.
+
+Text search uses a FULLTEXT index on MariaDB/MySQL and an FTS5 trigram table on SQLite; terms the
+index cannot hold (shorter than three characters, e.g. "7b") fall back to LIKE.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from huggingface_hub import HfApi
+from sqlalchemy import Integer, column, delete, desc, exists, func, select, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import CatalogFile, CatalogRepo
+from app.db.session import BackgroundSessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+_LIST_EXPAND = ["author", "downloads", "likes", "lastModified", "tags", "gguf", "sha", "siblings"]
+_COMMIT_EVERY = 50
+_MIN_INDEXED_TERM = 3  # InnoDB's default innodb_ft_min_token_size; also the FTS5 trigram length
+# Hub tags that say nothing about the model itself
+_NOISE_TAG_PREFIXES = ("region:", "endpoints_compatible", "autotrain_compatible", "text-generation-inference")
+
+# Quantization names as they appear in GGUF filenames: Q4_K_M, IQ3_XXS, Q8_0, TQ1_0, F16, BF16...
+_QUANT_RE = re.compile(r"(?<![A-Z0-9])((?:I|T)?Q\d(?:_[A-Z0-9]{1,3}){1,3}|BF16|F16|F32|MXFP4)(?![A-Z0-9])")
+_PARAMS_RE = re.compile(r"(?<![A-Za-z0-9.])(\d+(?:\.\d+)?)[Bb](?![A-Za-z0-9])")
+
+SORTS = {
+    "downloads": desc(CatalogRepo.downloads),
+    "likes": desc(CatalogRepo.likes),
+    "updated": desc(CatalogRepo.last_modified),
+}
+
+_wake = threading.Event()
+_refresher: threading.Thread | None = None
+_search_mode: str | None = None  # "fulltext", "fts5" or "like"
+_stats = {
+    "refreshes": 0,
+    "refresh_errors": 0,
+    "last_refresh_at": None,
+    "last_refresh_sec": None,
+    "last_error": None,
+    "repos_changed": 0,  # last pass: repos whose files were re-read
+    "searches": 0,
+    "search_sec_total": 0.0,
+}
+
+
+def parse_quantization(filename: str) -> str | None:
+    matches = _QUANT_RE.findall(filename.rsplit("/", 1)[-1].upper())
+    return matches[-1] if matches else None
+
+
+def _parameter_count(repo_id: str, gguf: dict | None) -> int | None:
+    total = (gguf or {}).get("total")
+    if total:
+        return int(total)
+    found = _PARAMS_RE.findall(repo_id.rsplit("/", 1)[-1])
+    return int(float(found[-1]) * 1e9) if found else None
+
+
+def _search_terms(q: str) -> list[str]:
+    return [t.lower() for t in re.findall(r"\w+", q or "")]
+
+
+def ensure_search_index() -> str:
+    """Create the SQLite FTS5 table if needed; returns the search mode this database supports."""
+    global _search_mode
+    dialect = engine.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        _search_mode = "fulltext"  # the FULLTEXT index comes with the table
+    elif dialect == "sqlite":
+        _search_mode = "like"
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    text(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_repos_fts USING fts5("
+                        "search_text, content='catalog_repos', content_rowid='id', tokenize='trigram')"
+                    )
+                )
+            _search_mode = "fts5"
+        except OperationalError:
+            logger.warning("SQLite without FTS5 trigram support; catalog search falls back to LIKE")
+    else:
+        _search_mode = "like"
+    return _search_mode
+
+
+def _rebuild_search_index(db: Session) -> None:
+    if _search_mode == "fts5":
+        db.execute(text("INSERT INTO catalog_repos_fts(catalog_repos_fts) VALUES('rebuild')"))
+
+
+def _text_filters(terms: list[str]) -> list:
+    indexed = [t for t in terms if len(t) >= _MIN_INDEXED_TERM]
+    short = [t for t in terms if len(t) < _MIN_INDEXED_TERM]
+    filters = []
+    if indexed and _search_mode == "fulltext":
+        filters.append(match(CatalogRepo.search_text, against=" ".join(f"+{t}*" for t in indexed)).in_boolean_mode())
+    elif indexed and _search_mode == "fts5":
+        matched = text("SELECT rowid FROM catalog_repos_fts WHERE catalog_repos_fts MATCH :fts").bindparams(
+            fts=" AND ".join(f'"{t}"' for t in indexed)
+        )
+        filters.append(CatalogRepo.id.in_(matched.columns(column("rowid", Integer))))
+    else:
+        short = terms
+    for term in short:
+        filters.append(CatalogRepo.search_text.like(f"%{term}%"))
+    return filters
+
+
+def search_catalog(
+    db: Session,
+    *,
+    q: str | None = None,
+    quantization: str | None = None,
+    architecture: str | None = None,
+    min_size_bytes: int | None = None,
+    max_size_bytes: int | None = None,
+    min_params: int | None = None,
+    max_params: int | None = None,
+    sort: str = "downloads",
+    limit: int = 20,
+    offset: int = 0,
+) -> list[tuple[CatalogRepo, list[CatalogFile]]]:
+    """Repos matching every filter, each with its GGUF files that pass the file filters.
+
+    quantization is a case-insensitive prefix ("Q4" matches Q4_0 and Q4_K_M).
+    """
+    started = time.perf_counter()
+    if _search_mode is None:
+        ensure_search_index()
+    file_filters = []
+    if quantization:
+        file_filters.append(CatalogFile.quantization.like(f"{quantization.strip().upper()}%"))
+    if min_size_bytes is not None:
+        file_filters.append(CatalogFile.size_bytes >= min_size_bytes)
+    if max_size_bytes is not None:
+        file_filters.append(CatalogFile.size_bytes <= max_size_bytes)
+
+    stmt = (
+        select(CatalogRepo)
+        .where(exists().where(CatalogFile.repo_id == CatalogRepo.id, *file_filters))
+        .where(*_text_filters(_search_terms(q)))
+    )
+    if architecture:
+        stmt = stmt.where(CatalogRepo.architecture == architecture.strip().lower())
+    if min_params is not None:
+        stmt = stmt.where(CatalogRepo.parameter_count >= min_params)
+    if max_params is not None:
+        stmt = stmt.where(CatalogRepo.parameter_count <= max_params)
+    repos = db.scalars(stmt.order_by(SORTS[sort], CatalogRepo.id).limit(limit).offset(offset)).all()
+
+    files_by_repo: dict[int, list[CatalogFile]] = {repo.id: [] for repo in repos}
+    if repos:
+        files = db.scalars(
+            select(CatalogFile)
+            .where(CatalogFile.repo_id.in_(files_by_repo), *file_filters)
+            .order_by(CatalogFile.repo_id, CatalogFile.filename)
+        ).all()
+        for f in files:
+            files_by_repo[f.repo_id].append(f)
+    _stats["searches"] += 1
+    _stats["search_sec_total"] += time.perf_counter() - started
+    return [(repo, files_by_repo[repo.id]) for repo in repos]
+
+
+def _gguf_sizes(api: HfApi, repo_id: str, siblings) -> dict[str, int | None]:
+    """filename -> size of the repo's GGUF files; names from the listing if the tree cannot be read."""
+    try:
+        return {
+            f.path: getattr(f, "size", None)
+            for f in api.list_repo_tree(repo_id, recursive=True, repo_type="model")
+            if f.path.lower().endswith(".gguf")
+        }
+    except Exception:
+        logger.warning("Could not list files of %s; keeping them without sizes", repo_id, exc_info=True)
+        names = (getattr(s, "rfilename", None) for s in siblings or [])
+        return {name: None for name in names if name and name.lower().endswith(".gguf")}
+
+
+def _apply_listing(repo: CatalogRepo, info) -> None:
+    gguf = getattr(info, "gguf", None) or {}
+    tags = [t for t in getattr(info, "tags", None) or [] if not t.startswith(_NOISE_TAG_PREFIXES)]
+    repo.author = getattr(info, "author", None) or repo.repo_id.split("/", 1)[0]
+    repo.downloads = getattr(info, "downloads", None) or 0
+    repo.likes = getattr(info, "likes", None) or 0
+    repo.architecture = (gguf.get("architecture") or "").lower() or None
+    repo.parameter_count = _parameter_count(repo.repo_id, gguf)
+    repo.context_length = gguf.get("context_length")
+    repo.tags = ",".join(tags)
+    repo.last_modified = getattr(info, "last_modified", None)
+    repo.refreshed_at = datetime.now(timezone.utc)
+    # Separators become spaces so the FULLTEXT parser sees "llama 3 8b instruct" as words.
+    words = re.sub(r"[/_.\-]+", " ", repo.repo_id)
+    repo.search_text = " ".join(filter(None, [repo.repo_id, words, repo.architecture, " ".join(tags)])).lower()
+
+
+def refresh_catalog(api: HfApi | None = None) -> int:
+    """One refresh pass; returns how many repos had their file list re-read."""
+    api = api or HfApi(token=settings.hf_token or None)
+    started = time.monotonic()
+    listing = api.list_models(
+        filter="gguf", sort="downloads", limit=settings.hf_catalog_max_repos, expand=_LIST_EXPAND
+    )
+    # Not expired on the intermediate commits: every known repo is looked at again.
+    db = BackgroundSessionLocal(expire_on_commit=False)
+    try:
+        known = {repo.repo_id: repo for repo in db.scalars(select(CatalogRepo))}
+        seen: set[str] = set()
+        changed = 0
+        for info in listing:
+            repo_id = getattr(info, "id", None)
+            if not repo_id or repo_id in seen:
+                continue
+            seen.add(repo_id)
+            repo = known.get(repo_id)
+            if repo is None:
+                repo = CatalogRepo(repo_id=repo_id)
+                db.add(repo)
+            _apply_listing(repo, info)
+            sha = getattr(info, "sha", None)
+            if repo.id is None or sha is None or repo.sha != sha:
+                sizes = _gguf_sizes(api, repo_id, getattr(info, "siblings", None))
+                repo.files = [
+                    CatalogFile(filename=name, size_bytes=size, quantization=parse_quantization(name))
+                    for name, size in sorted(sizes.items())
+                ]
+                repo.sha = sha
+                changed += 1
+            if len(seen) % _COMMIT_EVERY == 0:
+                db.commit()
+        # Repos that dropped out of the top list go, so the table stays HF_CATALOG_MAX_REPOS big.
+        gone = [repo.id for repo_id, repo in known.items() if repo_id not in seen]
+        if gone:
+            db.execute(delete(CatalogFile).where(CatalogFile.repo_id.in_(gone)))
+            db.execute(delete(CatalogRepo).where(CatalogRepo.id.in_(gone)))
+        if _search_mode is None:
+            ensure_search_index()
+        _rebuild_search_index(db)
+        db.commit()
+    finally:
+        db.close()
+    _stats["refreshes"] += 1
+    _stats["last_refresh_at"] = datetime.now(timezone.utc).isoformat()
+    _stats["last_refresh_sec"] = round(time.monotonic() - started, 1)
+    _stats["repos_changed"] = changed
+    _stats["last_error"] = None
+    return changed
+
+
+def _seconds_until_due() -> float:
+    db = BackgroundSessionLocal()
+    try:
+        last = db.scalar(select(func.max(CatalogRepo.refreshed_at)))
+    finally:
+        db.close()
+    if last is None:
+        return 0.0
+    if last.tzinfo is None:
+        last = last.replace(tzinfo=timezone.utc)
+    age = (datetime.now(timezone.utc) - last).total_seconds()
+    return max(0.0, settings.hf_catalog_refresh_sec - age)
+
+
+def _refresh_loop() -> None:
+    try:
+        # A restart does not re-download a catalog that is still fresh.
+        delay = _seconds_until_due()
+    except Exception:
+        delay = 0.0
+    while True:
+        _wake.wait(delay)
+        _wake.clear()
+        try:
+            refresh_catalog()
+        except Exception as e:
+            _stats["refresh_errors"] += 1
+            _stats["last_error"] = str(e)
+            logger.exception("Hub catalog refresh failed")
+        delay = settings.hf_catalog_refresh_sec
+
+
+def start_catalog_refresher() -> None:
+    global _refresher
+    if not settings.hf_catalog_refresh_sec or (_refresher is not None and _refresher.is_alive()):
+        return
+    _refresher = threading.Thread(target=_refresh_loop, name="hf-catalog", daemon=True)
+    _refresher.start()
+
+
+def request_catalog_refresh() -> bool:
+    """Run a refresh pass now; False if the refresher is disabled."""
+    if _refresher is None or not _refresher.is_alive():
+        return False
+    _wake.set()
+    return True
+
+
+def catalog_stats() -> dict:
+    searches = _stats["searches"]
+    return {
+        "search_mode": _search_mode,
+        "refresh_sec": settings.hf_catalog_refresh_sec,
+        "max_repos": settings.hf_catalog_max_repos,
+        **{k: v for k, v in _stats.items() if k != "search_sec_total"},
+        "avg_search_ms": round(_stats["search_sec_total"] / searches * 1000, 2) if searches else None,
+    }
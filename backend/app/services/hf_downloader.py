@@ -6,18 +6,30 @@ import time
 from datetime import datetime, timezone
 from pathlib import Path
 
-from sqlalchemy import update
+from sqlalchemy import select, update
 from huggingface_hub import get_hf_file_metadata, hf_hub_download, hf_hub_url
 from tqdm import tqdm
 
 from app.core.config import settings
+from app.core.metrics import download_bytes, download_jobs, download_throughput
 from app.db.models import Model, ModelDownloadJob
-from app.db.session import SessionLocal
-from app.services.ollama_client import register_model_in_ollama
-
-# Throttle DB updates: every N bytes or N seconds
-_PROGRESS_UPDATE_INTERVAL_BYTES = 512 * 1024  # 512 KB
-_PROGRESS_UPDATE_INTERVAL_SEC = 1.0
+from app.db.session import BackgroundSessionLocal
+from app.services.blob_store import adopt, file_sha256, hub_sha256, link_from_store, release
+from app.services.gguf import read_gguf_metadata
+from app.services.ollama_client import register_model_in_ollama, run_ollama_call
+from app.services.progress_bus import publish
+from app.services.ranged_download import (
+    RangedDownloadCancelled,
+    RangeNotSupportedError,
+    download_ranges,
+    host_slots,
+    incomplete_path,
+    parts_path,
+    resumable_bytes,
+)
+
+# Live progress is published at most this often; DB checkpoints use settings.download_checkpoint_sec
+_PROGRESS_PUBLISH_INTERVAL_SEC = 0.25
 _CANCEL_EVENTS: dict[int, threading.Event] = {}
 _CANCEL_EVENTS_LOCK = threading.Lock()
 
@@ -26,7 +38,7 @@ class DownloadCancelledError(RuntimeError):
     pass
 
 
-def _register_cancel_event(job_id: int) -> threading.Event:
+def register_cancel_event(job_id: int) -> threading.Event:
     with _CANCEL_EVENTS_LOCK:
         evt = _CANCEL_EVENTS.get(job_id)
         if evt is None:
@@ -49,38 +61,50 @@ def cancel_download_job(job_id: int) -> bool:
     return True
 
 
+def _make_progress_reporter(job_id: int):
+    """Publishes progress to the bus and checkpoints progress_bytes in the DB; thread-safe."""
+    lock = threading.Lock()
+    last = {"publish": 0.0, "checkpoint": time.monotonic()}
+
+    def report(cur: int) -> None:
+        now = time.monotonic()
+        with lock:
+            if now - last["publish"] < _PROGRESS_PUBLISH_INTERVAL_SEC:
+                return
+            last["publish"] = now
+            checkpoint = now - last["checkpoint"] >= settings.download_checkpoint_sec
+            if checkpoint:
+                last["checkpoint"] = now
+        publish(job_id, progress_bytes=int(cur))
+        if not checkpoint:
+            return
+        try:
+            sess = BackgroundSessionLocal()
+            try:
+                sess.execute(
+                    update(ModelDownloadJob)
+                    .where(ModelDownloadJob.id == job_id)
+                    .values(progress_bytes=int(cur))
+                )
+                sess.commit()
+            finally:
+                sess.close()
+        except Exception:
+            pass
+
+    return report
+
+
 def _make_progress_tqdm(job_id: int, cancel_event: threading.Event):
-    """Factory for tqdm class that updates progress_bytes in DB during download."""
+    """Factory for tqdm class that reports progress_bytes during download."""
+    report = _make_progress_reporter(job_id)
 
     class ProgressTqdm(tqdm):
-        _last_db_bytes = 0
-        _last_db_time = 0.0
-
         def update(self, n=1):
             super().update(n)
             if cancel_event.is_set():
                 raise DownloadCancelledError("Download cancelled")
-            cur = self.n
-            now = time.monotonic()
-            if (
-                cur - self._last_db_bytes >= _PROGRESS_UPDATE_INTERVAL_BYTES
-                or now - self._last_db_time >= _PROGRESS_UPDATE_INTERVAL_SEC
-            ):
-                self._last_db_bytes = cur
-                self._last_db_time = now
-                try:
-                    sess = SessionLocal()
-                    try:
-                        sess.execute(
-                            update(ModelDownloadJob)
-                            .where(ModelDownloadJob.id == job_id)
-                            .values(progress_bytes=int(cur))
-                        )
-                        sess.commit()
-                    finally:
-                        sess.close()
-                except Exception:
-                    pass
+            report(self.n)
 
     return ProgressTqdm
 
@@ -127,19 +151,100 @@ def delete_model_artifacts(model: Model) -> None:
                 path.unlink()
         except OSError:
             pass
+    if model.sha256:
+        release(model.sha256)
 
     _cleanup_partial_download(model)
 
 
-def start_download_job(job_id: int) -> None:
-    _register_cancel_event(job_id)
-    t = threading.Thread(target=_run_job, args=(job_id,), daemon=True)
-    t.start()
+def _gguf_metadata(path: str) -> dict:
+    """Header metadata for the Model row; empty when the file cannot be parsed (Ollama still can)."""
+    try:
+        return read_gguf_metadata(path)
+    except Exception:
+        return {}
+
+
+def backfill_gguf_metadata() -> None:
+    """Parse headers of library models downloaded before GGUF metadata was stored."""
+    db = BackgroundSessionLocal()
+    try:
+        models = db.scalars(
+            select(Model).where(Model.local_path.is_not(None), Model.architecture.is_(None))
+        ).all()
+        for model in models:
+            if not os.path.isfile(model.local_path):
+                continue
+            metadata = _gguf_metadata(model.local_path)
+            if metadata.get("architecture"):
+                db.execute(update(Model).where(Model.id == model.id).values(**metadata))
+                db.commit()
+    finally:
+        db.close()
+
+
+def _download_ranged(
+    job_id: int, url: str, dest: str, size: int, cancel_event: threading.Event
+) -> tuple[str, str] | None:
+    """Parallel Range download returning (path, sha256); None when the server cannot serve ranges
+    (use the single stream)."""
+    headers = {"authorization": f"Bearer {settings.hf_token}"} if settings.hf_token else {}
+    try:
+        return download_ranges(
+            url,
+            dest,
+            size,
+            headers=headers,
+            connections=settings.download_connections,
+            chunk_bytes=settings.download_chunk_bytes,
+            progress=_make_progress_reporter(job_id),
+            cancel_event=cancel_event,
+            slots=host_slots(url, settings.download_host_connections),
+        )
+    except RangedDownloadCancelled as e:
+        raise DownloadCancelledError(str(e)) from e
+    except RangeNotSupportedError:
+        for path in (incomplete_path(dest), parts_path(dest)):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        return None
+
+
+def _download_single_stream(job_id: int, model: Model, dest_dir: str, cancel_event: threading.Event) -> str:
+    # Rust hf_transfer skips tqdm — use the Python path so progress is reported
+    os.environ["HF_HUB_ENABLE_HF_TRANSFER"] = "0"
+    return hf_hub_download(
+        repo_id=model.hf_repo,
+        filename=model.hf_filename,
+        token=settings.hf_token or None,
+        local_dir=dest_dir,
+        local_dir_use_symlinks=False,
+        resume_download=True,
+        tqdm_class=_make_progress_tqdm(job_id, cancel_event),
+    )
+
+
+def _publish_job(job: ModelDownloadJob) -> None:
+    publish(
+        job.id,
+        model_id=job.model_id,
+        status=job.status,
+        progress_bytes=job.progress_bytes,
+        expected_bytes=job.expected_bytes,
+        error=job.error,
+    )
+
+
+def run_download_job(job_id: int) -> None:
+    """Worker entry point; called by download_scheduler once a slot is free."""
+    _run_job(job_id)
 
 
 def _run_job(job_id: int) -> None:
-    db = SessionLocal()
-    cancel_event = _register_cancel_event(job_id)
+    db = BackgroundSessionLocal()
+    cancel_event = register_cancel_event(job_id)
     try:
         job = db.get(ModelDownloadJob, job_id)
         if not job:
@@ -151,6 +256,7 @@ def _run_job(job_id: int) -> None:
             job.error = "Cancelled by user"
             job.finished_at = datetime.now(timezone.utc)
             db.commit()
+            _publish_job(job)
             return
 
         model = db.get(Model, job.model_id)
@@ -159,6 +265,7 @@ def _run_job(job_id: int) -> None:
             job.error = "Model not found"
             job.finished_at = datetime.now(timezone.utc)
             db.commit()
+            _publish_job(job)
             return
 
         if not _is_gguf(model.hf_filename):
@@ -166,6 +273,7 @@ def _run_job(job_id: int) -> None:
             job.error = "Only .gguf files are allowed in MVP"
             job.finished_at = datetime.now(timezone.utc)
             db.commit()
+            _publish_job(job)
             return
 
         job.status = "running"
@@ -175,84 +283,77 @@ def _run_job(job_id: int) -> None:
         job.finished_at = None
         job.expected_bytes = None
         db.commit()
+        _publish_job(job)
+
+        os.makedirs(settings.models_dir, exist_ok=True)
+        dest_dir = os.path.join(settings.models_dir, _safe_repo_dir(model.hf_repo))
+        os.makedirs(dest_dir, exist_ok=True)
+        dest = os.path.join(dest_dir, model.hf_filename)
 
         # Real file size from Hub (so UI can show X / Y MB — not a fake bar)
+        file_url = hf_hub_url(repo_id=model.hf_repo, filename=model.hf_filename)
+        expected_size: int | None = None
+        expected_sha256: str | None = None
+        resumed = 0
+        transfer_started = time.monotonic()
         try:
-            file_url = hf_hub_url(repo_id=model.hf_repo, filename=model.hf_filename)
             meta = get_hf_file_metadata(
                 url=file_url,
                 token=settings.hf_token or None,
                 timeout=60.0,
             )
+            expected_sha256 = hub_sha256(meta)
             sz = getattr(meta, "size", None)
             if sz is not None and int(sz) > 0:
-                _sess = SessionLocal()
+                expected_size = int(sz)
+                resumed = resumable_bytes(dest, expected_size, settings.download_chunk_bytes)
+                _sess = BackgroundSessionLocal()
                 try:
                     _sess.execute(
                         update(ModelDownloadJob)
                         .where(ModelDownloadJob.id == job_id)
-                        .values(expected_bytes=int(sz))
+                        .values(
+                            expected_bytes=expected_size,
+                            # Resumed after restart: continue from the chunks already on disk.
+                            progress_bytes=resumed,
+                        )
                     )
                     _sess.commit()
                 finally:
                     _sess.close()
+                publish(job_id, expected_bytes=expected_size, progress_bytes=resumed)
         except Exception:
             pass
 
-        # Rust hf_transfer often skips tqdm — use Python path so progress_bytes updates in DB
-        os.environ["HF_HUB_ENABLE_HF_TRANSFER"] = "0"
-
-        os.makedirs(settings.models_dir, exist_ok=True)
-        dest_dir = os.path.join(settings.models_dir, _safe_repo_dir(model.hf_repo))
-        os.makedirs(dest_dir, exist_ok=True)
-
-        # Fallback: poll file size when hf_transfer (Rust) is used and tqdm is not
-        stop_poll = threading.Event()
-
-        def _poll_file_size():
-            while not stop_poll.wait(2.0):
-                if cancel_event.is_set():
-                    return
-                try:
-                    max_sz = 0
-                    for root, _dirs, files in os.walk(dest_dir):
-                        for f in files:
-                            if f.lower().endswith(".gguf"):
-                                p = os.path.join(root, f)
-                                if os.path.isfile(p):
-                                    max_sz = max(max_sz, os.path.getsize(p))
-                    if max_sz > 0:
-                        sess = SessionLocal()
-                        try:
-                            sess.execute(
-                                update(ModelDownloadJob)
-                                .where(ModelDownloadJob.id == job_id)
-                                .values(progress_bytes=max_sz)
-                            )
-                            sess.commit()
-                        finally:
-                            sess.close()
-                except Exception:
-                    pass
-
-        poll_thread = threading.Thread(target=_poll_file_size, daemon=True)
-        poll_thread.start()
-        try:
-            local_path = hf_hub_download(
-                repo_id=model.hf_repo,
-                filename=model.hf_filename,
-                token=settings.hf_token or None,
-                local_dir=dest_dir,
-                local_dir_use_symlinks=False,
-                resume_download=True,
-                tqdm_class=_make_progress_tqdm(job_id, cancel_event),
-            )
-        finally:
-            stop_poll.set()
+        local_path = None
+        sha256: str | None = None
+        linked = False
+        if expected_sha256 and link_from_store(expected_sha256, dest):
+            # Same weights were already downloaded under another repo or file name.
+            local_path, sha256 = dest, expected_sha256
+            linked = True
+        if local_path is None and expected_size:
+            ranged = _download_ranged(job_id, file_url, dest, expected_size, cancel_event)
+            if ranged is not None:
+                local_path, sha256 = ranged
+        if local_path is None:
+            local_path = _download_single_stream(job_id, model, dest_dir, cancel_event)
 
         if cancel_event.is_set():
             raise DownloadCancelledError("Download cancelled")
 
+        if sha256 is None:
+            # hf_hub_download does not expose the stream, so the fallback path costs one extra read.
+            sha256 = file_sha256(local_path)
+        if expected_sha256 and sha256 != expected_sha256:
+            try:
+                os.unlink(local_path)
+            except OSError:
+                pass
+            raise RuntimeError(f"Checksum mismatch: Hub sha256 {expected_sha256}, downloaded {sha256}")
+        adopt(local_path, sha256)
+        metadata = _gguf_metadata(local_path)
+
         final_size = None
         try:
             final_size = os.path.getsize(local_path)
@@ -260,12 +361,14 @@ def _run_job(job_id: int) -> None:
             pass
 
         # Fresh session to avoid MariaDB "Record has changed" (1020)
-        db_final = SessionLocal()
+        db_final = BackgroundSessionLocal()
         try:
             db_final.execute(
                 update(Model).where(Model.id == model.id).values(
                     local_path=local_path,
                     size_bytes=int(final_size) if final_size is not None else None,
+                    sha256=sha256,
+                    **metadata,
                 )
             )
             db_final.execute(
@@ -281,11 +384,17 @@ def _run_job(job_id: int) -> None:
             model_fresh = db_final.get(Model, model.id)
         finally:
             db_final.close()
+        publish(job_id, status="done", progress_bytes=int(final_size) if final_size is not None else 0)
+        download_jobs.inc("done")
+        fetched = 0 if linked else max(0, (final_size or 0) - resumed)
+        if fetched:
+            download_bytes.inc(amount=fetched)
+            download_throughput.observe(fetched / max(time.monotonic() - transfer_started, 1e-3))
 
         # Register in Ollama
         if model_fresh:
             try:
-                register_model_in_ollama(model_fresh)
+                run_ollama_call(register_model_in_ollama, model_fresh)
             except Exception:
                 pass  # non-fatal
     except DownloadCancelledError:
@@ -302,6 +411,8 @@ def _run_job(job_id: int) -> None:
                 job.error = "Cancelled by user"
                 job.finished_at = datetime.now(timezone.utc)
                 db.commit()
+                _publish_job(job)
+            download_jobs.inc("cancelled")
         except Exception:
             db.rollback()
     except Exception as e:
@@ -313,6 +424,8 @@ def _run_job(job_id: int) -> None:
                 job.error = str(e)
                 job.finished_at = datetime.now(timezone.utc)
                 db.commit()
+                _publish_job(job)
+            download_jobs.inc("failed")
         except Exception:
             db.rollback()
     finally:
@@ -0,0 +1,125 @@
+"""Incremental persistence of a streamed assistant reply.
+
+The message row is inserted before the first token and the reply is appended to it in batches
+(every FLUSH_INTERVAL_SEC or FLUSH_BYTES of new text, whichever comes first), so a crash or a lost
+connection keeps everything up to the last flush while a long reply costs a handful of UPDATEs
+instead of one per token. Only the unflushed tail is held in memory.
+"""
+
+from __future__ import annotations
+
+import time
+
+from sqlalchemy import delete, update
+
+from app.db.models import Message
+from app.db.session import AsyncBackgroundSessionLocal, BackgroundSessionLocal
+from app.services.context_window import estimate_tokens
+
+FLUSH_INTERVAL_SEC = 1.0
+FLUSH_BYTES = 4096
+
+_stats = {"messages": 0, "flushes": 0, "bytes": 0}
+
+
+def _ns_to_ms(value: int | None) -> int | None:
+    return value // 1_000_000 if value else None
+
+
+class AssistantMessageWriter:
+    """Writes one assistant reply; content ends up stripped, like the reply sent to the client."""
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.message_id: int | None = None
+        self.started_at = time.monotonic()
+        self.first_token_at: float | None = None
+        self._pending = ""  # appended but not written yet
+        self._written_bytes = 0
+        self._flushed_at = self.started_at
+
+    async def start(self) -> int:
+        async with AsyncBackgroundSessionLocal() as db:
+            message = Message(chat_id=self.chat_id, role="assistant", content="", status="streaming")
+            db.add(message)
+            await db.flush()
+            # Known before the commit, so a cancellation landing in it still cleans the row up.
+            self.message_id = message.id
+            await db.commit()
+        _stats["messages"] += 1
+        return self.message_id
+
+    async def append(self, text: str) -> None:
+        if not text:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        if not self._written_bytes and not self._pending:
+            text = text.lstrip()
+        self._pending += text
+        if len(self._pending) >= FLUSH_BYTES or time.monotonic() - self._flushed_at >= FLUSH_INTERVAL_SEC:
+            await self.flush()
+
+    async def flush(self) -> None:
+        # Trailing whitespace waits for the next chunk: it is dropped if the reply ends here.
+        chunk = self._pending.rstrip()
+        self._flushed_at = time.monotonic()
+        if not chunk:
+            return
+        self._pending = self._pending[len(chunk) :]
+        self._written_bytes += len(chunk.encode("utf-8"))
+        # Same estimate as estimate_tokens() over the text written so far.
+        token_count = estimate_tokens("") + self._written_bytes // 4
+        async with AsyncBackgroundSessionLocal() as db:
+            await db.execute(
+                update(Message)
+                .where(Message.id == self.message_id)
+                .values(content=Message.content + chunk, token_count=token_count)
+            )
+            await db.commit()
+        _stats["flushes"] += 1
+        _stats["bytes"] += len(chunk.encode("utf-8"))
+
+    async def finish(self, status: str | None = None, stats: dict | None = None) -> bool:
+        """Write the tail and the final counters. status None marks a complete reply.
+
+        A reply that produced no text at all is deleted; returns whether the message was kept.
+        """
+        await self.flush()
+        if not self._written_bytes:
+            async with AsyncBackgroundSessionLocal() as db:
+                await db.execute(delete(Message).where(Message.id == self.message_id))
+                await db.commit()
+            return False
+        stats = stats or {}
+        tokens_used = stats.get("eval_count") or None
+        now = time.monotonic()
+        values = {
+            "status": status,
+            "tokens_used": tokens_used,
+            "prompt_eval_count": stats.get("prompt_eval_count") or None,
+            "ttft_ms": int((self.first_token_at - self.started_at) * 1000) if self.first_token_at else None,
+            "duration_ms": int((now - self.started_at) * 1000),
+            "prompt_eval_ms": _ns_to_ms(stats.get("prompt_eval_duration")),
+            "eval_ms": _ns_to_ms(stats.get("eval_duration")),
+        }
+        if tokens_used:
+            values["token_count"] = estimate_tokens("", tokens_used)
+        async with AsyncBackgroundSessionLocal() as db:
+            await db.execute(update(Message).where(Message.id == self.message_id).values(**values))
+            await db.commit()
+        return True
+
+
+def fail_interrupted_messages() -> None:
+    """Replies that were still streaming when the backend stopped keep their text but are marked failed."""
+    db = BackgroundSessionLocal()
+    try:
+        db.execute(update(Message).where(Message.status == "streaming").values(status="failed"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def message_writer_stats() -> dict:
+    return dict(_stats)
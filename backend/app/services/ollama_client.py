@@ -2,13 +2,17 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import os
+import time
 from pathlib import Path
+from typing import Callable
 
-import docker
 import httpx
 
+from app.core.config import settings
 from app.db.models import Model
 
 DEFAULT_SYSTEM_PROMPT = (
@@ -17,14 +21,166 @@ DEFAULT_SYSTEM_PROMPT = (
 )
 
 
+_STREAM_TIMEOUT = httpx.Timeout(300.0, connect=30.0)
+_BLOB_CHUNK_BYTES = 4 * 1024 * 1024
+
+RegistrationProgress = Callable[[str, int, int], None]
+
+# One keep-alive pool for the whole app; created on startup, closed on shutdown.
+_client: httpx.AsyncClient | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_requests_total = 0
+
+
+async def _count_request(request: httpx.Request) -> None:
+    global _requests_total
+    _requests_total += 1
+
+
+async def open_ollama_client() -> None:
+    """Create the shared Ollama HTTP client. Must run on the app event loop."""
+    global _client, _loop
+    if _client is not None:
+        return
+    _loop = asyncio.get_running_loop()
+    _client = httpx.AsyncClient(
+        base_url=settings.ollama_host.rstrip("/"),
+        timeout=httpx.Timeout(30.0),
+        limits=httpx.Limits(
+            max_connections=settings.ollama_max_connections,
+            max_keepalive_connections=settings.ollama_max_keepalive_connections,
+            keepalive_expiry=settings.ollama_keepalive_expiry,
+        ),
+        event_hooks={"request": [_count_request]},
+    )
+
+
+async def close_ollama_client() -> None:
+    global _client, _loop
+    client, _client, _loop = _client, None, None
+    if client is not None:
+        await client.aclose()
+
+
+def _http() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("Ollama client is not started")
+    return _client
+
+
+def run_ollama_call(fn, *args, **kwargs):
+    """Run an async Ollama call from a worker thread (sync route, download thread) on the app loop."""
+    if _loop is None:
+        raise RuntimeError("Ollama client is not started")
+    return asyncio.run_coroutine_threadsafe(fn(*args, **kwargs), _loop).result()
+
+
+def spawn_ollama_call(fn, *args, **kwargs) -> None:
+    """Fire-and-forget counterpart of run_ollama_call; does nothing before startup."""
+    if _loop is None:
+        return
+    asyncio.run_coroutine_threadsafe(fn(*args, **kwargs), _loop)
+
+
+def ollama_pool_stats() -> dict:
+    """Connection pool usage of the shared Ollama client, for sizing the limits."""
+    stats = {
+        "started": _client is not None,
+        "max_connections": settings.ollama_max_connections,
+        "max_keepalive_connections": settings.ollama_max_keepalive_connections,
+        "keepalive_expiry": settings.ollama_keepalive_expiry,
+        "requests_total": _requests_total,
+        "connections": 0,
+        "idle": 0,
+        "active": 0,
+        "queued": 0,
+    }
+    # httpx does not expose pool state publicly; read httpcore's pool defensively.
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    if pool is None:
+        return stats
+    connections = list(getattr(pool, "connections", None) or [])
+    idle = sum(1 for c in connections if c.is_idle())
+    stats["connections"] = len(connections)
+    stats["idle"] = idle
+    stats["active"] = len(connections) - idle
+    stats["queued"] = sum(1 for r in getattr(pool, "_requests", None) or [] if getattr(r, "connection", None) is None)
+    return stats
+
+
 def _ollama_model_name(model: Model) -> str:
     """Unique Ollama model name for our Model."""
-    return f"boom-{model.id}"
+    return ollama_name_for_id(model.id)
+
 
+def ollama_name_for_id(model_id: int) -> str:
+    return f"boom-{model_id}"
 
-def _ollama_url(path: str) -> str:
-    base = (os.getenv("OLLAMA_HOST") or "http://localhost:11434").rstrip("/")
-    return f"{base}{path}"
+
+def model_id_from_ollama_name(name: str) -> int | None:
+    """Inverse of _ollama_model_name for names reported by Ollama ("boom-3:latest" -> 3)."""
+    base = name.split(":")[0]
+    if base.startswith("boom-") and base[5:].isdigit():
+        return int(base[5:])
+    return None
+
+
+def _default_keep_alive() -> str:
+    return f"{settings.keep_alive_default_sec}s"
+
+
+# In-process view of Ollama's registry keyed by boom-{id}: {"registered": bool, "plain_template": bool, "expires": float}.
+# Saves the /api/show round trip before every chat turn.
+_registry: dict[str, dict] = {}
+_registry_hits = 0
+_registry_misses = 0
+
+
+def _registry_get(ollama_name: str) -> dict | None:
+    global _registry_hits, _registry_misses
+    entry = _registry.get(ollama_name)
+    if entry is None or entry["expires"] < time.monotonic():
+        _registry.pop(ollama_name, None)
+        _registry_misses += 1
+        return None
+    _registry_hits += 1
+    return entry
+
+
+def _registry_put(ollama_name: str, *, registered: bool, plain_template: bool | None) -> dict:
+    entry = {
+        "registered": registered,
+        "plain_template": plain_template,
+        "expires": time.monotonic() + settings.ollama_registry_ttl_sec,
+    }
+    _registry[ollama_name] = entry
+    return entry
+
+
+def invalidate_ollama_registry(ollama_name: str) -> None:
+    _registry.pop(ollama_name, None)
+
+
+def ollama_registry_stats() -> dict:
+    return {
+        "entries": len(_registry),
+        "hits": _registry_hits,
+        "misses": _registry_misses,
+        "ttl_sec": settings.ollama_registry_ttl_sec,
+    }
+
+
+async def _registry_lookup(ollama_name: str) -> dict:
+    """Registration state and template kind of one model, from cache or a single /api/show."""
+    entry = _registry_get(ollama_name)
+    if entry is not None:
+        return entry
+    r = await _http().post("/api/show", json={"model": ollama_name}, timeout=10.0)
+    if r.status_code == 404:
+        return _registry_put(ollama_name, registered=False, plain_template=None)
+    r.raise_for_status()
+    template = (r.json().get("template") or "").strip()
+    return _registry_put(ollama_name, registered=True, plain_template=template == "{{ .Prompt }}")
 
 
 def _looks_like_broken_ollama_model_error(message: str) -> bool:
@@ -36,18 +192,25 @@ def _looks_like_broken_ollama_model_error(message: str) -> bool:
     )
 
 
-def _uses_plain_completion_template(ollama_name: str) -> bool:
-    """Models without a chat template need explicit prompt formatting."""
+async def _uses_plain_completion_template(model: Model) -> bool:
+    """Models without a chat template need explicit prompt formatting.
+
+    A GGUF without tokenizer.chat_template always gets Ollama's plain template, so that is decided
+    from the stored header. Ollama only recognises some embedded templates, so files that do carry
+    one are still checked against /api/show (cached in the registry).
+    """
+    if model.architecture and not model.chat_template:
+        return True
+    ollama_name = _ollama_model_name(model)
     try:
-        r = httpx.post(_ollama_url("/api/show"), json={"model": ollama_name}, timeout=10.0)
-        if r.status_code != 200:
-            return False
-        data = r.json()
-        return (data.get("template") or "").strip() == "{{ .Prompt }}"
+        return bool((await _registry_lookup(ollama_name))["plain_template"])
     except Exception:
         return False
 
 
+_COMPLETION_TURN_BLOCK = 8
+
+
 def _completion_prompt(messages: list[dict[str, str]]) -> str:
     """Format chat messages for completion-only GGUF models.
 
@@ -66,8 +229,11 @@ def _completion_prompt(messages: list[dict[str, str]]) -> str:
         elif role in {"user", "assistant"}:
             dialogue.append({"role": role, "content": content})
 
-    # Small completion models are easily derailed by long or bad previous turns.
-    dialogue = dialogue[-8:]
+    # Small completion models are easily derailed by long or bad previous turns, so only the last
+    # one to two blocks of turns are kept. Dropping whole blocks keeps the prompt start unchanged
+    # between turns, which lets Ollama reuse the evaluated prefix.
+    drop = (max(len(dialogue) - _COMPLETION_TURN_BLOCK, 0) // _COMPLETION_TURN_BLOCK) * _COMPLETION_TURN_BLOCK
+    dialogue = dialogue[drop:]
     system_text = "\n\n".join(system_parts).strip() or DEFAULT_SYSTEM_PROMPT
 
     lines = ["<|startoftext|>"]
@@ -82,59 +248,190 @@ def _completion_options(options: dict) -> dict:
     return {**options, "stop": ["<|im_end|>", "<|im_start|>"]}
 
 
+# Last /api/generate turn per conversation: {"seen": prompt + reply text, "context": tokens Ollama
+# returned for it}. The next turn sends only the new part of the prompt together with context.
+_GENERATE_CONTEXTS_MAX = 128
+_generate_contexts: dict[str, dict] = {}
+_generate_context_hits = 0
+_generate_context_misses = 0
+
+
+def _generate_payload(ollama_name: str, prompt: str, options: dict, keep_alive: str, context_key: str | None) -> dict:
+    payload = {
+        "model": ollama_name,
+        "prompt": prompt,
+        "stream": True,
+        "keep_alive": keep_alive,
+        "options": _completion_options(options),
+    }
+    if context_key is None:
+        return payload
+    previous = _generate_contexts.get(context_key)
+    # Only valid when the new prompt literally continues the previous one; a moved history window,
+    # edited system prompt or trimmed reply falls back to the full prompt.
+    if previous and len(prompt) > len(previous["seen"]) and prompt.startswith(previous["seen"]):
+        payload["prompt"] = prompt[len(previous["seen"]) :]
+        payload["context"] = previous["context"]
+    return payload
+
+
+def _count_generate_context(hit: bool) -> None:
+    global _generate_context_hits, _generate_context_misses
+    if hit:
+        _generate_context_hits += 1
+    else:
+        _generate_context_misses += 1
+
+
+def _remember_generate_context(context_key: str, seen: str, context: list[int]) -> None:
+    _generate_contexts.pop(context_key, None)
+    _generate_contexts[context_key] = {"seen": seen, "context": context}
+    while len(_generate_contexts) > _GENERATE_CONTEXTS_MAX:
+        _generate_contexts.pop(next(iter(_generate_contexts)))
+
+
+def generate_context_stats() -> dict:
+    return {
+        "entries": len(_generate_contexts),
+        "hits": _generate_context_hits,
+        "misses": _generate_context_misses,
+    }
+
+
+# Counters of Ollama's final chunk passed on to the caller.
+_DONE_STATS = (
+    "eval_count",
+    "prompt_eval_count",
+    "total_duration",
+    "load_duration",
+    "prompt_eval_duration",
+    "eval_duration",
+)
+
+
+# Several downloads finishing together must not hash/upload multi-GB blobs all at once.
+_create_slots = asyncio.Semaphore(settings.ollama_create_concurrency)
+_registrations: dict[str, dict] = {}
+
+
+def _file_sha256(path: str, progress: RegistrationProgress) -> str:
+    size = os.path.getsize(path)
+    h = hashlib.sha256()
+    done = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(_BLOB_CHUNK_BYTES):
+            h.update(chunk)
+            done += len(chunk)
+            progress("hashing", done, size)
+    return h.hexdigest()
+
+
+async def _iter_file(path: str, progress: RegistrationProgress):
+    size = os.path.getsize(path)
+    done = 0
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, _BLOB_CHUNK_BYTES):
+            done += len(chunk)
+            progress("uploading", done, size)
+            yield chunk
+
+
+async def _push_blob(path: str, digest: str, progress: RegistrationProgress) -> None:
+    """Upload the GGUF into Ollama's blob store unless a blob with this digest already exists."""
+    size = os.path.getsize(path)
+    r = await _http().head(f"/api/blobs/{digest}", timeout=30.0)
+    if r.status_code == 200:
+        progress("uploading", size, size)
+        return
+    r = await _http().post(
+        f"/api/blobs/{digest}",
+        content=_iter_file(path, progress),
+        headers={"Content-Length": str(size)},
+        timeout=httpx.Timeout(None, connect=30.0),
+    )
+    if r.status_code not in (200, 201):
+        raise RuntimeError(f"Ollama blob upload failed: {r.status_code} {r.text[:200]}")
+
+
+def _track_registration(ollama_name: str, progress: RegistrationProgress | None) -> RegistrationProgress:
+    def report(stage: str, done: int, total: int) -> None:
+        _registrations[ollama_name] = {"stage": stage, "done": done, "total": total}
+        if progress is not None:
+            progress(stage, done, total)
+
+    return report
+
+
+def ollama_registration_stats() -> dict:
+    return {
+        "concurrency": settings.ollama_create_concurrency,
+        "in_progress": dict(_registrations),
+    }
+
+
+async def register_model_in_ollama(model: Model, progress: RegistrationProgress | None = None) -> None:
+    """Create model in Ollama from downloaded GGUF file via the blob + create HTTP API.
 
-def register_model_in_ollama(model: Model) -> None:
-    """Create model in Ollama from downloaded GGUF file."""
+    progress(stage, done, total) is called with stage "queued", "hashing", "uploading" and "creating".
+    """
     if not model.local_path or not os.path.isfile(model.local_path):
         raise RuntimeError("Model file is missing on disk")
-    model_dir = Path(model.local_path).parent
     ollama_name = _ollama_model_name(model)
-    modelfile_path = model_dir / f"Modelfile.{ollama_name}"
-    modelfile_path.write_text(f"FROM {model.local_path}\n", encoding="utf-8")
+    report = _track_registration(ollama_name, progress)
+    invalidate_ollama_registry(ollama_name)
+    report("queued", 0, 0)
     try:
-        client = docker.from_env()
-        container_id = Path("/etc/hostname").read_text(encoding="utf-8").strip()
-        client.containers.run(
-            "ollama/ollama:latest",
-            ["create", ollama_name, "-f", str(modelfile_path)],
-            remove=True,
-            volumes_from=[container_id],
-            network_mode=f"container:{container_id}",
-            environment={"OLLAMA_HOST": "http://ollama:11434"},
-        )
-    except docker.errors.ContainerError as e:
-        raise RuntimeError(f"Ollama create failed: {e}") from e
-
-
-def ensure_model_in_ollama(model: Model) -> None:
+        async with _create_slots:
+            # Downloads are hashed while they stream; only older library entries need a pass here.
+            sha256 = model.sha256 or await asyncio.to_thread(_file_sha256, model.local_path, report)
+            digest = "sha256:" + sha256
+            await _push_blob(model.local_path, digest, report)
+            payload = {"model": ollama_name, "files": {Path(model.local_path).name: digest}, "stream": True}
+            async with _http().stream("POST", "/api/create", json=payload, timeout=httpx.Timeout(600.0, connect=30.0)) as resp:
+                if resp.status_code >= 400:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")
+                    raise RuntimeError(f"Ollama create failed: {resp.status_code} {body[:400]}")
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if data.get("error"):
+                        raise RuntimeError(f"Ollama create failed: {data['error']}")
+                    report("creating", int(data.get("completed") or 0), int(data.get("total") or 0))
+    finally:
+        _registrations.pop(ollama_name, None)
+        invalidate_ollama_registry(ollama_name)
+
+
+async def ensure_model_in_ollama(model: Model) -> None:
     """Register model in Ollama if not already present."""
     ollama_name = _ollama_model_name(model)
     try:
-        r = httpx.get(_ollama_url(f"/api/tags"), timeout=5.0)
-        if r.status_code == 200:
-            data = r.json()
-            for m in data.get("models", []):
-                if m.get("name", "").startswith(ollama_name):
-                    return  # already exists
+        if (await _registry_lookup(ollama_name))["registered"]:
+            return  # already exists
     except Exception:
         pass
-    register_model_in_ollama(model)
+    await register_model_in_ollama(model)
 
 
-def recreate_model_in_ollama(model: Model) -> None:
+async def recreate_model_in_ollama(model: Model) -> None:
     """Rebuild a broken Ollama model registration from the GGUF file."""
+    invalidate_ollama_registry(_ollama_model_name(model))
     try:
-        unload_model_from_ollama(model)
+        await unload_model_from_ollama(model)
     except Exception:
         pass
     try:
-        delete_model_from_ollama(model)
+        await delete_model_from_ollama(model)
     except Exception:
         pass
-    register_model_in_ollama(model)
+    await register_model_in_ollama(model)
 
 
-def chat_stream(
+async def chat_stream(
     model: Model,
     messages: list[dict[str, str]],
     *,
@@ -143,8 +440,18 @@ def chat_stream(
     top_p: float = 0.95,
     top_k: int = 40,
     repeat_penalty: float = 1.1,
+    num_ctx: int | None = None,
+    keep_alive: str | None = None,
+    context_key: str | None = None,
 ):
-    """Stream chat completion from Ollama. Yields (content_delta, done, eval_count)."""
+    """Stream chat completion from Ollama. Yields (content_delta, done, stats).
+
+    stats is empty until the final item, which carries Ollama's counters (eval_count,
+    prompt_eval_count and the durations in ns). keep_alive comes from the residency manager;
+    without it the configured default is used. context_key names the conversation so completion
+    models can continue from the tokens of the previous turn.
+    """
+    keep_alive = keep_alive or _default_keep_alive()
     ollama_name = _ollama_model_name(model)
     options = {
         "temperature": temperature,
@@ -154,79 +461,72 @@ def chat_stream(
     }
     if max_tokens is not None:
         options["num_predict"] = max_tokens
+    if num_ctx is not None:
+        options["num_ctx"] = num_ctx
+    prompt = _completion_prompt(messages)
     last_err: Exception | None = None
     attempted_recreate = False
 
     while True:
-        with httpx.Client(timeout=httpx.Timeout(300.0, connect=30.0)) as client:
-            if _uses_plain_completion_template(ollama_name):
-                requests = (
-                    (
-                        "/api/generate",
-                        {
-                            "model": ollama_name,
-                            "prompt": _completion_prompt(messages),
-                            "stream": True,
-                            "keep_alive": "30m",
-                            "options": _completion_options(options),
-                        },
-                    ),
-                )
-            else:
-                requests = (
-                    (
-                        "/api/chat",
-                        {
-                            "model": ollama_name,
-                            "messages": messages,
-                            "stream": True,
-                            "keep_alive": "30m",
-                            "options": options,
-                        },
-                    ),
-                    (
-                        "/api/generate",
-                        {
-                            "model": ollama_name,
-                            "prompt": _completion_prompt(messages),
-                            "stream": True,
-                            "keep_alive": "30m",
-                            "options": _completion_options(options),
-                        },
-                    ),
-                )
-            for path, payload in requests:
-                try:
-                    with client.stream("POST", _ollama_url(path), json=payload) as resp:
-                        if resp.status_code >= 400:
-                            body = resp.read().decode("utf-8", errors="replace")
-                            raise RuntimeError(f"{path}: {resp.status_code} {body[:400]}")
-                        eval_count = 0
-                        for line in resp.iter_lines():
-                            if not line:
-                                continue
-                            try:
-                                data = json.loads(line)
-                            except json.JSONDecodeError:
-                                continue
-                            if path == "/api/chat":
-                                msg = data.get("message") or {}
-                                content = msg.get("content") or ""
-                            else:
-                                content = data.get("response") or ""
-                            if content:
-                                yield content, False, 0
-                            if data.get("done"):
-                                eval_count = data.get("eval_count") or 0
-                                yield "", True, eval_count
-                                return
-                except Exception as e:
-                    last_err = e
-                    continue
+        generate = ("/api/generate", _generate_payload(ollama_name, prompt, options, keep_alive, context_key))
+        if await _uses_plain_completion_template(model):
+            requests = (generate,)
+        else:
+            requests = (
+                (
+                    "/api/chat",
+                    {
+                        "model": ollama_name,
+                        "messages": messages,
+                        "stream": True,
+                        "keep_alive": keep_alive,
+                        "options": options,
+                    },
+                ),
+                generate,
+            )
+        for path, payload in requests:
+            if path == "/api/generate" and context_key:
+                _count_generate_context("context" in payload)
+            try:
+                async with _http().stream("POST", path, json=payload, timeout=_STREAM_TIMEOUT) as resp:
+                    if resp.status_code >= 400:
+                        body = (await resp.aread()).decode("utf-8", errors="replace")
+                        raise RuntimeError(f"{path}: {resp.status_code} {body[:400]}")
+                    reply: list[str] = []
+                    async for line in resp.aiter_lines():
+                        if not line:
+                            continue
+                        try:
+                            data = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if path == "/api/chat":
+                            msg = data.get("message") or {}
+                            content = msg.get("content") or ""
+                        else:
+                            content = data.get("response") or ""
+                        if content:
+                            reply.append(content)
+                            yield content, False, {}
+                        if data.get("done"):
+                            if path == "/api/generate" and context_key and data.get("context"):
+                                # Stored the way _completion_prompt renders this turn next time (stripped),
+                                # otherwise edge whitespace in the reply breaks the prefix match.
+                                _remember_generate_context(context_key, prompt + "".join(reply).strip(), data["context"])
+                            yield "", True, {key: data.get(key) or 0 for key in _DONE_STATS}
+                            return
+            except Exception as e:
+                last_err = e
+                if path == "/api/generate" and context_key:
+                    _generate_contexts.pop(context_key, None)
+                continue
 
+        # Registry state may be stale (model removed behind our back); recheck on next turn.
+        invalidate_ollama_registry(ollama_name)
         if last_err and (not attempted_recreate) and _looks_like_broken_ollama_model_error(str(last_err)):
             attempted_recreate = True
-            recreate_model_in_ollama(model)
+            await recreate_model_in_ollama(model)
             last_err = None
             continue
         break
@@ -234,30 +534,30 @@ def chat_stream(
     raise last_err or RuntimeError("Failed to stream response from Ollama")
 
 
-def load_model_in_ollama(model: Model) -> None:
+async def load_model_in_ollama(model: Model, keep_alive: str | None = None) -> None:
     """Trigger Ollama to load the model into memory (preload)."""
-    ensure_model_in_ollama(model)
+    keep_alive = keep_alive or _default_keep_alive()
+    await ensure_model_in_ollama(model)
     ollama_name = _ollama_model_name(model)
     last_err: Exception | None = None
     attempted_recreate = False
 
     while True:
         for path, payload in (
-            ("/api/chat", {"model": ollama_name, "messages": [{"role": "user", "content": " "}], "stream": False, "options": {"num_predict": 1}, "keep_alive": "30m"}),
-            ("/api/generate", {"model": ollama_name, "prompt": " ", "stream": False, "options": {"num_predict": 1}, "keep_alive": "30m"}),
+            ("/api/chat", {"model": ollama_name, "messages": [{"role": "user", "content": " "}], "stream": False, "options": {"num_predict": 1}, "keep_alive": keep_alive}),
+            ("/api/generate", {"model": ollama_name, "prompt": " ", "stream": False, "options": {"num_predict": 1}, "keep_alive": keep_alive}),
         ):
             try:
-                with httpx.Client(timeout=120.0) as client:
-                    r = client.post(_ollama_url(path), json=payload)
-                    if r.status_code == 200:
-                        return
-                    last_err = RuntimeError(f"{path}: {r.status_code} {r.text[:400]}")
+                r = await _http().post(path, json=payload, timeout=120.0)
+                if r.status_code == 200:
+                    return
+                last_err = RuntimeError(f"{path}: {r.status_code} {r.text[:400]}")
             except Exception as e:
                 last_err = e
 
         if last_err and (not attempted_recreate) and _looks_like_broken_ollama_model_error(str(last_err)):
             attempted_recreate = True
-            recreate_model_in_ollama(model)
+            await recreate_model_in_ollama(model)
             last_err = None
             continue
         break
@@ -265,13 +565,12 @@ def load_model_in_ollama(model: Model) -> None:
     raise (last_err or RuntimeError("Failed to load model"))
 
 
-def get_model_parameters(model: Model) -> dict:
+async def get_model_parameters(model: Model) -> dict:
     """Fetch model parameters from Ollama /api/show. Returns dict with temperature, num_predict, top_p, top_k, repeat_penalty, etc.
     Does NOT register the model - only fetches if already in Ollama."""
     ollama_name = _ollama_model_name(model)
-    url = _ollama_url("/api/show")
     try:
-        r = httpx.post(url, json={"model": ollama_name}, timeout=10.0)
+        r = await _http().post("/api/show", json={"model": ollama_name}, timeout=10.0)
         if r.status_code != 200:
             return {}
         data = r.json()
@@ -297,41 +596,48 @@ def get_model_parameters(model: Model) -> dict:
         return {}
 
 
-def unload_model_from_ollama(model: Model) -> None:
-    """Unload model from Ollama memory via keep_alive=0. Tries /api/chat then /api/generate."""
-    ollama_name = _ollama_model_name(model)
+async def unload_model_from_ollama(model: Model) -> None:
+    """Unload model from Ollama memory via keep_alive=0."""
+    await unload_ollama_model(_ollama_model_name(model))
+
+
+async def unload_ollama_model(ollama_name: str) -> None:
+    """Unload by Ollama name via keep_alive=0. Tries /api/chat then /api/generate."""
     for path, payload in (
         ("/api/chat", {"model": ollama_name, "messages": [], "keep_alive": 0, "stream": False}),
         ("/api/generate", {"model": ollama_name, "prompt": "", "keep_alive": 0, "stream": False}),
     ):
         try:
-            with httpx.Client(timeout=30.0) as client:
-                r = client.post(_ollama_url(path), json=payload)
-                if r.status_code in (200, 404):
-                    return
+            r = await _http().post(path, json=payload, timeout=30.0)
+            if r.status_code in (200, 404):
+                return
         except Exception:
             continue
 
 
-def delete_model_from_ollama(model: Model) -> None:
+async def delete_model_from_ollama(model: Model) -> None:
     """Delete registered model from Ollama. 404 is treated as already deleted."""
+    invalidate_ollama_registry(_ollama_model_name(model))
     try:
-        with httpx.Client(timeout=30.0) as client:
-            r = client.request("DELETE", _ollama_url("/api/delete"), json={"model": _ollama_model_name(model)})
-            if r.status_code in (200, 404):
-                return
-            raise RuntimeError(f"Ollama delete failed: {r.status_code} {r.text[:200]}")
+        r = await _http().request("DELETE", "/api/delete", json={"model": _ollama_model_name(model)}, timeout=30.0)
+        if r.status_code in (200, 404):
+            return
+        raise RuntimeError(f"Ollama delete failed: {r.status_code} {r.text[:200]}")
     except Exception as e:
         raise RuntimeError(str(e)) from e
 
 
-def list_loaded_ollama() -> list[str]:
-    """List model names currently loaded in Ollama (for show)."""
+async def list_running_ollama() -> list[dict]:
+    """Raw /api/ps entries: name, size (bytes in memory), size_vram, expires_at, ..."""
     try:
-        r = httpx.get(_ollama_url("/api/ps"), timeout=5.0)
+        r = await _http().get("/api/ps", timeout=5.0)
         if r.status_code != 200:
             return []
-        data = r.json()
-        return [m.get("name", "").split(":")[0] for m in data.get("models", [])]
+        return list(r.json().get("models") or [])
     except Exception:
         return []
+
+
+async def list_loaded_ollama() -> list[str]:
+    """List model names currently loaded in Ollama (for show)."""
+    return [m.get("name", "").split(":")[0] for m in await list_running_ollama()]
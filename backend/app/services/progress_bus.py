@@ -0,0 +1,87 @@
+"""In-memory live state of download jobs, pushed to SSE subscribers.
+
+Download threads publish here on every write; the DB only receives coarse checkpoints and state
+changes. Subscribers are coalescing: a slow client gets the latest state of each changed job,
+never a backlog of intermediate updates.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+# Finished jobs stay visible this long so subscribers can observe the final state.
+_TERMINAL_RETENTION_SEC = 60.0
+_TERMINAL_STATES = ("done", "failed", "cancelled")
+
+_jobs: dict[int, dict] = {}
+_finished_at: dict[int, float] = {}
+_subscribers: set[_Subscriber] = set()
+_lock = threading.Lock()
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.dirty: set[int] = set()
+        self.event = asyncio.Event()
+
+
+def publish(job_id: int, **fields) -> None:
+    """Merge fields into the live state of a job and notify subscribers. Thread-safe."""
+    now = time.monotonic()
+    with _lock:
+        state = _jobs.setdefault(job_id, {"id": job_id})
+        state.update(fields)
+        if state.get("status") in _TERMINAL_STATES:
+            _finished_at.setdefault(job_id, now)
+        else:
+            _finished_at.pop(job_id, None)
+        for stale in [j for j, t in _finished_at.items() if now - t > _TERMINAL_RETENTION_SEC]:
+            _finished_at.pop(stale, None)
+            _jobs.pop(stale, None)
+        subscribers = list(_subscribers)
+        for sub in subscribers:
+            sub.dirty.add(job_id)
+    for sub in subscribers:
+        try:
+            sub.loop.call_soon_threadsafe(sub.event.set)
+        except RuntimeError:
+            pass  # loop already closed
+
+
+def live_state(job_id: int) -> dict | None:
+    with _lock:
+        state = _jobs.get(job_id)
+        return dict(state) if state else None
+
+
+def snapshot() -> list[dict]:
+    with _lock:
+        return [dict(s) for s in _jobs.values()]
+
+
+async def subscribe(min_interval_sec: float = 0.5):
+    """Yield lists of changed job states, at most once per min_interval_sec."""
+    sub = _Subscriber(asyncio.get_running_loop())
+    with _lock:
+        _subscribers.add(sub)
+    try:
+        while True:
+            await sub.event.wait()
+            sub.event.clear()
+            with _lock:
+                changed = [dict(_jobs[j]) for j in sub.dirty if j in _jobs]
+                sub.dirty.clear()
+            if changed:
+                yield changed
+            await asyncio.sleep(min_interval_sec)
+    finally:
+        with _lock:
+            _subscribers.discard(sub)
+
+
+def progress_bus_stats() -> dict:
+    with _lock:
+        return {"jobs": len(_jobs), "subscribers": len(_subscribers)}
@@ -0,0 +1,261 @@
+"""Multi-connection HTTP range downloader for large GGUF files.
+
+The file is preallocated as <dest>.incomplete and split into fixed-size chunks that are fetched
+concurrently with Range requests and written in place with pwrite. Per-chunk progress is kept in
+<dest>.incomplete.parts so an interrupted download resumes each chunk where it stopped.
+
+The SHA-256 of the file is computed during the download over its contiguous written prefix, so
+no second pass over a multi-GB file is needed to verify it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from urllib.parse import urlparse
+
+import httpx
+
+_READ_BYTES = 1024 * 1024
+_STATE_SAVE_INTERVAL_SEC = 2.0
+_CHUNK_ATTEMPTS = 4
+
+
+# Connection caps shared by every download talking to the same host.
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+_host_slots_lock = threading.Lock()
+
+
+def host_slots(url: str, limit: int) -> threading.BoundedSemaphore:
+    host = urlparse(url).hostname or ""
+    with _host_slots_lock:
+        slots = _host_slots.get(host)
+        if slots is None:
+            slots = threading.BoundedSemaphore(limit)
+            _host_slots[host] = slots
+        return slots
+
+
+class RangeNotSupportedError(RuntimeError):
+    """The server ignored the Range header; callers should fall back to a single stream."""
+
+
+class RangedDownloadCancelled(RuntimeError):
+    pass
+
+
+def incomplete_path(dest: str) -> str:
+    return f"{dest}.incomplete"
+
+
+def parts_path(dest: str) -> str:
+    return f"{dest}.incomplete.parts"
+
+
+def _load_parts(dest: str, size: int, chunk_bytes: int) -> dict[int, int]:
+    """Bytes already written per chunk; discarded unless size and chunking match the saved state."""
+    if not os.path.isfile(incomplete_path(dest)):
+        return {}
+    try:
+        with open(parts_path(dest), encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("size") != size or state.get("chunk_bytes") != chunk_bytes:
+            return {}
+        return {int(k): int(v) for k, v in (state.get("done") or {}).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_parts(dest: str, size: int, chunk_bytes: int, done: dict[int, int]) -> None:
+    tmp = f"{parts_path(dest)}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"size": size, "chunk_bytes": chunk_bytes, "done": done}, f)
+    os.replace(tmp, parts_path(dest))
+
+
+def resumable_bytes(dest: str, size: int, chunk_bytes: int) -> int:
+    """Bytes a resumed download of dest can skip."""
+    return sum(_load_parts(dest, size, chunk_bytes).values())
+
+
+class _PrefixHasher:
+    """SHA-256 over a file that is written out of order.
+
+    Bytes are hashed once the prefix before them is complete: straight from the just-written
+    buffer when it extends the prefix, otherwise read back from the (page-cached) file when an
+    earlier chunk catches up. Bytes skipped by a resume are read back the same way.
+    """
+
+    def __init__(self, fd: int):
+        self.offset = 0
+        self._fd = fd
+        self._h = hashlib.sha256()
+        self._lock = threading.Lock()
+
+    def advance(self, end: int, data: bytes = b"", data_offset: int = 0, *, blocking: bool = True) -> None:
+        """Hash up to end. A non-blocking call returns at once while another thread is hashing;
+        whatever it skips is picked up by a later call."""
+        if not self._lock.acquire(blocking=blocking):
+            return
+        try:
+            while self.offset < end:
+                if data_offset <= self.offset < data_offset + len(data):
+                    stop = min(end, data_offset + len(data))
+                    piece = data[self.offset - data_offset : stop - data_offset]
+                else:
+                    piece = os.pread(self._fd, min(_READ_BYTES, end - self.offset), self.offset)
+                    if not piece:
+                        raise OSError(f"Short read at offset {self.offset} while hashing")
+                self._h.update(piece)
+                self.offset += len(piece)
+        finally:
+            self._lock.release()
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+def _preallocate(fd: int, size: int) -> None:
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        # Not supported by the platform / filesystem: a sparse file works as well.
+        os.ftruncate(fd, size)
+
+
+def download_ranges(
+    url: str,
+    dest: str,
+    size: int,
+    *,
+    headers: dict[str, str] | None = None,
+    connections: int = 4,
+    chunk_bytes: int = 64 * 1024 * 1024,
+    progress: Callable[[int], None] | None = None,
+    cancel_event: threading.Event | None = None,
+    slots: threading.Semaphore | None = None,
+    timeout: float = 60.0,
+) -> tuple[str, str]:
+    """Download url (size bytes) into dest using up to `connections` parallel Range requests.
+
+    progress(total_bytes_done) is called from worker threads after every write.
+    If slots is given, every open connection holds one of them (per-host cap across downloads).
+    Returns (dest, sha256 hex digest of the file). Raises RangeNotSupportedError before writing
+    anything if ranges are not honoured.
+    """
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    chunks = [(i, start, min(start + chunk_bytes, size) - 1) for i, start in enumerate(range(0, size, chunk_bytes))]
+    done = _load_parts(dest, size, chunk_bytes)
+    lock = threading.Lock()
+    failed = threading.Event()
+    total = sum(done.values())
+    last_save = time.monotonic()
+    frontier_chunk = 0  # first chunk that is not fully written yet
+
+    client = httpx.Client(
+        headers=headers or {},
+        follow_redirects=True,
+        timeout=httpx.Timeout(timeout, connect=30.0),
+        limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+    )
+    fd = os.open(incomplete_path(dest), os.O_RDWR | os.O_CREAT, 0o644)
+    hasher = _PrefixHasher(fd)
+    try:
+        if os.fstat(fd).st_size != size:
+            _preallocate(fd, size)
+
+        def written_prefix() -> int:
+            """End of the contiguous written prefix; caller holds lock."""
+            nonlocal frontier_chunk
+            while frontier_chunk < len(chunks):
+                _, start, end = chunks[frontier_chunk]
+                if done.get(frontier_chunk, 0) < end + 1 - start:
+                    return start + done.get(frontier_chunk, 0)
+                frontier_chunk += 1
+            return size
+
+        def stopped() -> bool:
+            return failed.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+        def fetch(index: int, start: int, end: int) -> None:
+            nonlocal total, last_save
+            for attempt in range(_CHUNK_ATTEMPTS):
+                offset = start + done.get(index, 0)
+                if offset > end or stopped():
+                    return
+                if slots is not None:
+                    while not slots.acquire(timeout=0.5):
+                        if stopped():
+                            return
+                try:
+                    with client.stream("GET", url, headers={"Range": f"bytes={offset}-{end}"}) as resp:
+                        if resp.status_code == 200:
+                            raise RangeNotSupportedError("Server does not support range requests")
+                        resp.raise_for_status()
+                        for data in resp.iter_bytes(_READ_BYTES):
+                            if stopped():
+                                return
+                            data = data[: end + 1 - offset]
+                            os.pwrite(fd, data, offset)
+                            data_offset = offset
+                            offset += len(data)
+                            with lock:
+                                done[index] = offset - start
+                                total += len(data)
+                                cur = total
+                                prefix = written_prefix()
+                                now = time.monotonic()
+                                if now - last_save >= _STATE_SAVE_INTERVAL_SEC:
+                                    last_save = now
+                                    _save_parts(dest, size, chunk_bytes, done)
+                            if prefix > hasher.offset:
+                                hasher.advance(prefix, data, data_offset, blocking=False)
+                            if progress is not None:
+                                progress(cur)
+                    if offset > end:
+                        return
+                except RangeNotSupportedError:
+                    raise
+                except (httpx.HTTPError, OSError):
+                    if attempt == _CHUNK_ATTEMPTS - 1:
+                        raise
+                    time.sleep(min(2**attempt, 10))
+                finally:
+                    if slots is not None:
+                        slots.release()
+            raise RuntimeError(f"Chunk {index} incomplete after {_CHUNK_ATTEMPTS} attempts")
+
+        def run(chunk: tuple[int, int, int]) -> None:
+            try:
+                fetch(*chunk)
+            except BaseException:
+                failed.set()
+                raise
+
+        with ThreadPoolExecutor(max_workers=max(1, connections), thread_name_prefix="range-dl") as pool:
+            futures = [pool.submit(run, chunk) for chunk in chunks]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        with lock:
+            _save_parts(dest, size, chunk_bytes, done)
+        if cancel_event is not None and cancel_event.is_set():
+            raise RangedDownloadCancelled("Download cancelled")
+        if errors:
+            range_errors = [e for e in errors if isinstance(e, RangeNotSupportedError)]
+            raise range_errors[0] if range_errors else errors[0]
+        hasher.advance(size)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+        client.close()
+
+    os.replace(incomplete_path(dest), dest)
+    try:
+        os.unlink(parts_path(dest))
+    except OSError:
+        pass
+    return dest, hasher.hexdigest()
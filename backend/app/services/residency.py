@@ -0,0 +1,344 @@
+"""Memory-aware residency of models in Ollama.
+
+Tracks which models Ollama holds in RAM (from /api/ps plus our own loads), how much memory each
+takes and how it is used. Before a model is loaded, idle models are unloaded (LRU or LFU) until
+it fits into the memory budget, and every request gets a keep_alive adapted to how often the
+model is actually used, instead of one fixed value for all models.
+
+With MODEL_PRELOAD, opening a chat warms its model up in the background. A preload only uses
+free memory and is the first thing given up when a real request needs room.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from app.core.config import settings
+from app.db.models import Model
+from app.db.session import AsyncBackgroundSessionLocal
+from app.services.ollama_client import (
+    list_running_ollama,
+    load_model_in_ollama,
+    model_id_from_ollama_name,
+    ollama_name_for_id,
+    spawn_ollama_call,
+    unload_ollama_model,
+)
+
+# /api/ps is re-read at most this often; our own loads/unloads update the view in between.
+_PS_TTL_SEC = 2.0
+# LFU counts halve per hour so yesterday's favourite does not stay resident forever.
+_USE_HALF_LIFE_SEC = 3600.0
+_GAP_EMA_ALPHA = 0.3
+# Above this share of the budget every model gets the minimum keep_alive.
+_PRESSURE_RATIO = 0.9
+
+
+class _Usage:
+    def __init__(self):
+        self.last_used = 0.0
+        self.uses = 0.0
+        self.gap_ema: float | None = None
+        self.active = 0
+        self.footprint: int | None = None  # bytes, as last reported by /api/ps
+
+
+_usage: dict[int, _Usage] = {}
+# model_id -> {"size": bytes, "expires_at": str | None}; models Ollama holds in memory
+_loaded: dict[int, dict] = {}
+_foreign_bytes = 0  # models loaded in Ollama that are not ours (cannot be evicted)
+_ps_checked = 0.0
+_evictions = 0
+_lock = asyncio.Lock()
+
+# Preloads in flight (model_id -> task, start time) and finished but not used yet (model_id -> load seconds)
+_preloads: dict[int, asyncio.Task] = {}
+_preload_started: dict[int, float] = {}
+_preloaded: dict[int, float] = {}
+_preload_stats = {
+    "started": 0,
+    "completed": 0,
+    "skipped_no_room": 0,
+    "cancelled": 0,
+    "failed": 0,
+    "hits": 0,
+    "wasted": 0,
+    "ttft_saved_sec": 0.0,
+}
+
+
+def memory_budget_bytes() -> int:
+    """RAM budget for loaded models; 0 means unlimited."""
+    if settings.model_memory_budget_mb:
+        return settings.model_memory_budget_mb * 1024 * 1024
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.8)
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+
+def _get_usage(model_id: int) -> _Usage:
+    usage = _usage.get(model_id)
+    if usage is None:
+        usage = _usage[model_id] = _Usage()
+    return usage
+
+
+def _decayed_uses(usage: _Usage, now: float) -> float:
+    return usage.uses * 0.5 ** ((now - usage.last_used) / _USE_HALF_LIFE_SEC)
+
+
+def _record_use(model_id: int) -> None:
+    usage = _get_usage(model_id)
+    now = time.monotonic()
+    if usage.last_used:
+        gap = now - usage.last_used
+        usage.gap_ema = gap if usage.gap_ema is None else _GAP_EMA_ALPHA * gap + (1 - _GAP_EMA_ALPHA) * usage.gap_ema
+    usage.uses = _decayed_uses(usage, now) + 1
+    usage.last_used = now
+
+
+def _footprint(model: Model) -> int:
+    usage = _usage.get(model.id)
+    if usage and usage.footprint:
+        return usage.footprint
+    size = model.size_bytes
+    if not size and model.local_path:
+        try:
+            size = os.path.getsize(model.local_path)
+        except OSError:
+            size = 0
+    return int((size or 0) * settings.model_memory_overhead)
+
+
+def _used_bytes() -> int:
+    return _foreign_bytes + sum(entry["size"] for entry in _loaded.values())
+
+
+def _keep_alive_sec(model_id: int) -> int:
+    """Long enough to bridge the model's usual pause between requests, clamped to
+    KEEP_ALIVE_MIN_SEC..KEEP_ALIVE_MAX_SEC; memory pressure gets the minimum."""
+    lo, hi = settings.keep_alive_min_sec, settings.keep_alive_max_sec
+    budget = memory_budget_bytes()
+    if budget and _used_bytes() > budget * _PRESSURE_RATIO:
+        return lo
+    usage = _usage.get(model_id)
+    if usage is None or usage.gap_ema is None:
+        return min(max(settings.keep_alive_default_sec, lo), hi)
+    return int(min(max(2 * usage.gap_ema, lo), hi))
+
+
+async def _refresh(force: bool = False) -> None:
+    global _foreign_bytes, _ps_checked
+    now = time.monotonic()
+    if not force and now - _ps_checked < _PS_TTL_SEC:
+        return
+    running = await list_running_ollama()
+    loaded: dict[int, dict] = {}
+    foreign = 0
+    for entry in running:
+        size = int(entry.get("size") or 0)
+        model_id = model_id_from_ollama_name(entry.get("name") or "")
+        if model_id is None:
+            foreign += size
+            continue
+        loaded[model_id] = {"size": size, "expires_at": entry.get("expires_at")}
+        if size:
+            _get_usage(model_id).footprint = size
+    for model_id, entry in _loaded.items():
+        usage = _usage.get(model_id)
+        if model_id not in loaded and ((usage and usage.active) or model_id in _preloads):
+            loaded[model_id] = entry  # admitted and still loading: /api/ps does not list it yet
+    for model_id in [m for m in _preloaded if m not in loaded]:
+        _preloaded.pop(model_id, None)  # expired before anyone used it
+        _preload_stats["wasted"] += 1
+    _loaded.clear()
+    _loaded.update(loaded)
+    _foreign_bytes = foreign
+    _ps_checked = now
+
+
+def _eviction_order(exclude: int) -> list[int]:
+    now = time.monotonic()
+    candidates = [mid for mid in _loaded if mid != exclude and not (_usage.get(mid) and _usage[mid].active)]
+
+    def last_used(mid: int) -> float:
+        usage = _usage.get(mid)
+        return usage.last_used if usage else 0.0
+
+    if settings.model_eviction_policy == "lfu":
+        order = sorted(
+            candidates,
+            key=lambda mid: (_decayed_uses(_usage[mid], now) if mid in _usage else 0.0, last_used(mid)),
+        )
+    else:
+        order = sorted(candidates, key=last_used)
+    # Speculative loads nobody has used yet go first.
+    return sorted(order, key=lambda mid: not (mid in _preloads or mid in _preloaded))
+
+
+async def _admit(model: Model) -> None:
+    """Make room for model within the budget by unloading idle models. Caller holds _lock."""
+    global _evictions
+    await _refresh()
+    budget = memory_budget_bytes()
+    need = _footprint(model)
+    if model.id not in _loaded and budget:
+        for victim in _eviction_order(exclude=model.id):
+            if _used_bytes() + need <= budget:
+                break
+            task = _preloads.get(victim)
+            if task is not None:
+                task.cancel()  # its cancellation handler unloads whatever got loaded
+            else:
+                await unload_ollama_model(ollama_name_for_id(victim))
+                if _preloaded.pop(victim, None) is not None:
+                    _preload_stats["wasted"] += 1
+            _loaded.pop(victim, None)
+            _evictions += 1
+        # A model larger than what can be freed is still loaded: Ollama is the final arbiter.
+    _loaded.setdefault(model.id, {"size": need, "expires_at": None})
+
+
+@asynccontextmanager
+async def use_model(model: Model):
+    """Hold model resident for one request; yields the keep_alive to send to Ollama."""
+    global _ps_checked
+    _record_use(model.id)
+    _count_preload_hit(model.id)
+    async with _lock:
+        await _admit(model)
+    usage = _get_usage(model.id)
+    usage.active += 1
+    try:
+        yield f"{_keep_alive_sec(model.id)}s"
+    finally:
+        usage.active -= 1
+        # Let the next decision see Ollama's real footprint and expiry.
+        _ps_checked = 0.0
+
+
+def _count_preload_hit(model_id: int) -> None:
+    """A request found its model warmed up (or warming up): the load time it did not wait for."""
+    saved = _preloaded.pop(model_id, None)
+    if saved is None and model_id in _preload_started:
+        # Still loading: the part already done is saved; the finished preload is not counted again.
+        saved = time.monotonic() - _preload_started.pop(model_id)
+    if saved is not None:
+        _preload_stats["hits"] += 1
+        _preload_stats["ttft_saved_sec"] += saved
+
+
+def schedule_preload(model_id: int) -> None:
+    """Warm up a model in the background (MODEL_PRELOAD); callable from sync routes."""
+    if settings.model_preload:
+        spawn_ollama_call(_start_preload, model_id)
+
+
+async def _start_preload(model_id: int) -> None:
+    if model_id in _preloads:
+        return
+    _preloads[model_id] = asyncio.create_task(_preload(model_id))
+
+
+async def _preload(model_id: int) -> None:
+    started = _preload_started[model_id] = time.monotonic()
+    try:
+        async with AsyncBackgroundSessionLocal() as db:
+            model = await db.get(Model, model_id)
+        if not model or not model.local_path:
+            return
+        async with _lock:
+            await _refresh()
+            if model_id in _loaded:
+                return  # already warm
+            budget = memory_budget_bytes()
+            need = _footprint(model)
+            if budget and _used_bytes() + need > budget:
+                # Never evict anything for a guess.
+                _preload_stats["skipped_no_room"] += 1
+                return
+            _loaded[model_id] = {"size": need, "expires_at": None}
+        _preload_stats["started"] += 1
+        # Short keep_alive: an unused preload should give its memory back soon.
+        await load_model_in_ollama(model, keep_alive=f"{settings.keep_alive_min_sec}s")
+        if model_id in _preload_started:
+            _preloaded[model_id] = time.monotonic() - started
+        _preload_stats["completed"] += 1
+    except asyncio.CancelledError:
+        _preload_stats["cancelled"] += 1
+        _loaded.pop(model_id, None)
+        # Ollama may finish the load anyway; release it without blocking the cancelling request.
+        asyncio.ensure_future(unload_ollama_model(ollama_name_for_id(model_id)))
+        raise
+    except Exception:
+        _loaded.pop(model_id, None)
+        _preload_stats["failed"] += 1
+    finally:
+        _preloads.pop(model_id, None)
+        _preload_started.pop(model_id, None)
+
+
+async def load_resident(model: Model) -> None:
+    """Explicit preload through the residency manager."""
+    async with use_model(model) as keep_alive:
+        await load_model_in_ollama(model, keep_alive=keep_alive)
+
+
+async def unload_resident(model: Model) -> None:
+    async with _lock:
+        await unload_ollama_model(ollama_name_for_id(model.id))
+        _loaded.pop(model.id, None)
+
+
+async def residency_state() -> dict:
+    async with _lock:
+        await _refresh(force=True)
+    now = time.monotonic()
+    models = []
+    for model_id, entry in sorted(_loaded.items()):
+        usage = _usage.get(model_id)
+        models.append(
+            {
+                "model_id": model_id,
+                "size_bytes": entry["size"],
+                "expires_at": entry["expires_at"],
+                "active_requests": usage.active if usage else 0,
+                "idle_sec": round(now - usage.last_used, 1) if usage and usage.last_used else None,
+                "uses": round(_decayed_uses(usage, now), 2) if usage else 0.0,
+                "keep_alive_sec": _keep_alive_sec(model_id),
+            }
+        )
+    return {
+        "budget_bytes": memory_budget_bytes(),
+        "used_bytes": _used_bytes(),
+        "foreign_bytes": _foreign_bytes,
+        "policy": settings.model_eviction_policy,
+        "evictions": _evictions,
+        "preload": _preload_summary(),
+        "models": models,
+    }
+
+
+def _preload_summary() -> dict:
+    return {
+        "enabled": settings.model_preload,
+        "in_flight": sorted(_preloads),
+        "warm_unused": sorted(_preloaded),
+        **_preload_stats,
+        "ttft_saved_sec": round(_preload_stats["ttft_saved_sec"], 3),
+    }
+
+
+def residency_stats() -> dict:
+    return {
+        "budget_bytes": memory_budget_bytes(),
+        "used_bytes": _used_bytes(),
+        "loaded": len(_loaded),
+        "policy": settings.model_eviction_policy,
+        "evictions": _evictions,
+        "preload": _preload_summary(),
+    }
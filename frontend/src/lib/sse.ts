@@ -1,19 +1,22 @@
 export type SseEvent = {
   event: string
   data: string
+  id?: string
 }
 
 function parseSseBlock(block: string): SseEvent | null {
   const lines = block.split('\n')
   let event = 'message'
+  let id: string | undefined
   let dataLines: string[] = []
   for (const raw of lines) {
     const line = raw.replace(/\r$/, '')
     if (line.startsWith('event:')) event = line.slice('event:'.length).trim()
     else if (line.startsWith('data:')) dataLines.push(line.slice('data:'.length).trimStart())
+    else if (line.startsWith('id:')) id = line.slice('id:'.length).trim()
   }
   if (!event && dataLines.length === 0) return null
-  return { event, data: dataLines.join('\n') }
+  return { event, data: dataLines.join('\n'), id }
 }
 
 export async function* fetchSse(
@@ -21,6 +24,10 @@ export async function* fetchSse(
   opts: RequestInit
 ): AsyncGenerator<SseEvent, void, unknown> {
   const res = await fetch(url, opts)
+  if (res.status === 429) {
+    const retryAfter = res.headers.get('Retry-After')
+    throw new Error(`Server is busy, try again${retryAfter ? ` in ${retryAfter}s` : ' later'}`)
+  }
   if (!res.ok) throw new Error(`SSE failed: ${res.status} ${res.statusText}`)
   if (!res.body) throw new Error('SSE failed: empty body')
 
@@ -45,3 +52,31 @@ export async function* fetchSse(
   }
 }
 
+
+// Follows a resumable stream: when the connection drops, reconnects with Last-Event-ID and the
+// server replays the missed events. HTTP errors are not retried.
+export async function* resumableSse(
+  url: string,
+  opts: RequestInit,
+  retries = 3
+): AsyncGenerator<SseEvent, void, unknown> {
+  let lastId: string | undefined
+  let attempt = 0
+  while (true) {
+    try {
+      const headers = new Headers(opts.headers)
+      if (lastId) headers.set('Last-Event-ID', lastId)
+      for await (const evt of fetchSse(url, { ...opts, headers })) {
+        if (evt.id) lastId = evt.id
+        attempt = 0
+        yield evt
+      }
+      return
+    } catch (e) {
+      // fetch and stream reads fail with TypeError on network errors
+      if (!(e instanceof TypeError) || !lastId || attempt >= retries) throw e
+      attempt++
+      await new Promise((resolve) => setTimeout(resolve, 1000 * attempt))
+    }
+  }
+}
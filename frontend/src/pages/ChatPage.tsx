@@ -25,8 +25,8 @@ function splitByThinkTags(text: string): { type: 'normal' | 'think'; text: strin
   return parts
 }
 import type { ApiError } from '../lib/api'
-import { fetchSse } from '../lib/sse'
-import type { ChatDetail, ChatOut, MessageOut, ModelOut } from '../types'
+import { resumableSse } from '../lib/sse'
+import type { ChatDetail, ChatListOut, ChatOut, MessageOut, ModelOut } from '../types'
 
 export function ChatPage({
   auth,
@@ -36,6 +36,8 @@ export function ChatPage({
   const token = auth.token!
   const [models, setModels] = useState<ModelOut[]>([])
   const [chats, setChats] = useState<ChatOut[]>([])
+  const [chatsCursor, setChatsCursor] = useState<number | null>(null)
+  const [loadingOlder, setLoadingOlder] = useState(false)
   const [activeChatId, setActiveChatId] = useState<number | null>(null)
   const [detail, setDetail] = useState<ChatDetail | null>(null)
 
@@ -44,10 +46,12 @@ export function ChatPage({
 
   const [input, setInput] = useState('')
   const [busy, setBusy] = useState(false)
+  const [queuePosition, setQueuePosition] = useState<number | null>(null)
   const [err, setErr] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
   const [loadErr, setLoadErr] = useState<string | null>(null)
   const messagesEndRef = useRef<HTMLDivElement | null>(null)
+  const messagesBoxRef = useRef<HTMLDivElement | null>(null)
 
   const [temperature, setTemperature] = useState(0.7)
   const [maxTokens, setMaxTokens] = useState<number | ''>('')
@@ -65,10 +69,11 @@ export function ChatPage({
     try {
       const [m, c] = await Promise.all([
         apiRequest<ModelOut[]>('/models', { token }),
-        apiRequest<ChatOut[]>('/chats', { token }),
+        apiRequest<ChatListOut>('/chats', { token }),
       ])
       setModels(m)
-      setChats(c)
+      setChats(c.chats)
+      setChatsCursor(c.next_cursor)
       if (newChatModelId === '' && m.length > 0) {
         const firstReady = m.find((item) => !!item.local_path)
         if (firstReady) setNewChatModelId(firstReady.id)
@@ -94,6 +99,43 @@ export function ChatPage({
     }
   }
 
+  async function loadMoreChats() {
+    if (chatsCursor == null || loadingOlder) return
+    setLoadingOlder(true)
+    try {
+      const c = await apiRequest<ChatListOut>(`/chats?before_id=${chatsCursor}`, { token })
+      setChats((prev) => [...prev, ...c.chats])
+      setChatsCursor(c.next_cursor)
+    } catch (e: any) {
+      setErr((e as ApiError)?.message ?? String(e))
+    } finally {
+      setLoadingOlder(false)
+    }
+  }
+
+  async function loadOlderMessages() {
+    if (!detail || detail.next_cursor == null || loadingOlder) return
+    const box = messagesBoxRef.current
+    const prevHeight = box?.scrollHeight ?? 0
+    setLoadingOlder(true)
+    try {
+      const older = await apiRequest<ChatDetail>(`/chats/${detail.chat.id}?before_id=${detail.next_cursor}`, { token })
+      setDetail((d) =>
+        d && d.chat.id === older.chat.id
+          ? { ...d, messages: [...older.messages, ...d.messages], next_cursor: older.next_cursor }
+          : d
+      )
+      // Keep the viewport on the message the user was reading.
+      requestAnimationFrame(() => {
+        if (box) box.scrollTop += box.scrollHeight - prevHeight
+      })
+    } catch (e: any) {
+      setErr((e as ApiError)?.message ?? String(e))
+    } finally {
+      setLoadingOlder(false)
+    }
+  }
+
   useEffect(() => {
     auth.fetchMe().catch(() => {})
     refreshSidebar()
@@ -215,23 +257,36 @@ export function ChatPage({
       }
       let assistantText = ''
       let tokensUsed: number | null = null
+      const showAssistantText = () => {
+        setDetail((d) => {
+          if (!d) return d
+          const msgs = [...d.messages]
+          for (let i = msgs.length - 1; i >= 0; i--) {
+            if (msgs[i].role === 'assistant') {
+              msgs[i] = { ...msgs[i], content: assistantText }
+              break
+            }
+          }
+          return { ...d, messages: msgs }
+        })
+      }
 
-      for await (const evt of fetchSse(streamUrl, streamOpts)) {
-        if (evt.event === 'token') {
+      for await (const evt of resumableSse(streamUrl, streamOpts)) {
+        if (evt.event === 'queued') {
+          setQueuePosition(parseInt(evt.data, 10) || null)
+        } else if (evt.event === 'start') {
+          setQueuePosition(null)
+        } else if (evt.event === 'resync') {
+          // Missed more than the server buffers: it sends the whole reply so far instead
+          assistantText = evt.data
+          showAssistantText()
+        } else if (evt.event === 'token') {
           assistantText += evt.data
-          setDetail((d) => {
-            if (!d) return d
-            const msgs = [...d.messages]
-            for (let i = msgs.length - 1; i >= 0; i--) {
-              if (msgs[i].role === 'assistant') {
-                msgs[i] = { ...msgs[i], content: assistantText }
-                break
-              }
-            }
-            return { ...d, messages: msgs }
-          })
+          showAssistantText()
           queueMicrotask(() => messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' }))
         } else if (evt.event === 'error') {
+          // Stopped on request: the partial reply is saved and shown after reload
+          if (evt.data === 'cancelled') break
           throw new Error(evt.data || 'generation failed')
         } else if (evt.event === 'done') {
           tokensUsed = evt.data ? parseInt(evt.data, 10) : null
@@ -262,6 +317,16 @@ export function ChatPage({
       setErr(ae?.message ?? String(e))
     } finally {
       setBusy(false)
+      setQueuePosition(null)
+    }
+  }
+
+  async function onStop() {
+    if (!activeChatId) return
+    try {
+      await apiRequest(`/chats/${activeChatId}/stream/cancel`, { method: 'POST', token })
+    } catch (e: any) {
+      setErr((e as ApiError)?.message ?? String(e))
     }
   }
 
@@ -319,7 +384,14 @@ export function ChatPage({
         {loading ? (
           <div className="muted">Загрузка…</div>
         ) : (
-        <div className="list" style={{ maxHeight: '60vh', overflow: 'auto' }}>
+        <div
+          className="list"
+          style={{ maxHeight: '60vh', overflow: 'auto' }}
+          onScroll={(e) => {
+            const el = e.currentTarget
+            if (el.scrollHeight - el.scrollTop - el.clientHeight < 40) loadMoreChats()
+          }}
+        >
           {chats.map((c) => (
             <div
               key={c.id}
@@ -344,16 +416,32 @@ export function ChatPage({
             </div>
           ))}
           {chats.length === 0 ? <div className="muted">No chats yet.</div> : null}
+          {chatsCursor != null ? (
+            <button type="button" className="btn-ghost" onClick={loadMoreChats} disabled={loadingOlder}>
+              {loadingOlder ? 'Загрузка…' : 'Ещё чаты'}
+            </button>
+          ) : null}
         </div>
         )}
       </div>
 
       <div className="chatBox">
-        <div className="messages">
+        <div
+          className="messages"
+          ref={messagesBoxRef}
+          onScroll={(e) => {
+            if (e.currentTarget.scrollTop < 40) loadOlderMessages()
+          }}
+        >
           {!detail ? (
             <div className="muted">Pick a chat or create a new one.</div>
           ) : (
             <>
+              {detail.next_cursor != null ? (
+                <div className="muted" style={{ fontSize: 12, textAlign: 'center' }}>
+                  {loadingOlder ? 'Загрузка…' : 'Прокрутите вверх, чтобы загрузить ранние сообщения'}
+                </div>
+              ) : null}
               {detail.messages.map((m) => (
                 <div key={m.id} className={`msg ${m.role}`}>
                   <div className="muted" style={{ fontSize: 12, marginBottom: 6 }}>
@@ -372,9 +460,11 @@ export function ChatPage({
                     )
                   )}
                   </div>
-                  {m.role === 'assistant' && (m.tokens_used != null) ? (
+                  {m.role === 'assistant' && (m.tokens_used != null || m.status === 'failed') ? (
                     <div className="muted msg-tokens" style={{ fontSize: 11, marginTop: 6 }}>
-                      Токенов: {m.tokens_used}
+                      {m.status === 'failed' ? 'Ответ прерван' : `${m.status === 'cancelled' ? 'Остановлено · ' : ''}Токенов: ${m.tokens_used}`}
+                      {m.ttft_ms != null ? ` · первый токен ${(m.ttft_ms / 1000).toFixed(1)} с` : ''}
+                      {m.duration_ms != null ? ` · всего ${(m.duration_ms / 1000).toFixed(1)} с` : ''}
                     </div>
                   ) : null}
                 </div>
@@ -392,7 +482,12 @@ export function ChatPage({
               placeholder={detail ? 'Type a message…' : 'Create/select a chat first…'}
               disabled={!detail || busy}
             />
-            <button type="submit" className="btn-primary" disabled={!detail || busy || !input.trim()}>{busy ? 'Sending…' : 'Send'}</button>
+            <button type="submit" className="btn-primary" disabled={!detail || busy || !input.trim()}>{queuePosition ? `Queued #${queuePosition}` : busy ? 'Sending…' : 'Send'}</button>
+            {busy ? (
+              <button type="button" onClick={onStop}>
+                Stop
+              </button>
+            ) : null}
           </div>
           {err ? (
             <div style={{ marginTop: 10, color: 'tomato' }}>
@@ -1,11 +1,13 @@
-import { useEffect, useMemo, useState } from 'react'
-import { apiRequest } from '../lib/api'
+import { useEffect, useMemo, useRef, useState } from 'react'
+import { API_BASE_URL, apiRequest } from '../lib/api'
 import type { ApiError } from '../lib/api'
+import { fetchSse } from '../lib/sse'
 import type {
   HfModelSummary,
   HfRepoFile,
   LoadedModelsResponse,
   ModelDownloadJobOut,
+  ModelLibraryItemOut,
   ModelParamsOut,
   ModelOut,
 } from '../types'
@@ -30,6 +32,22 @@ function formatElapsedSec(startedAt: string | null, nowMs: number): string {
   return `${s} с`
 }
 
+function formatParamCount(n: number): string {
+  if (n >= 1e9) return `${(n / 1e9).toFixed(1)}B`
+  if (n >= 1e6) return `${Math.round(n / 1e6)}M`
+  return String(n)
+}
+
+// GGUF header metadata, e.g. "llama · 8.0B · Q4_K_M · ctx 131072"
+function modelMetaLine(m: ModelOut): string {
+  const parts: string[] = []
+  if (m.architecture) parts.push(m.architecture)
+  if (m.parameter_count) parts.push(formatParamCount(m.parameter_count))
+  if (m.quantization) parts.push(m.quantization)
+  if (m.context_length) parts.push(`ctx ${m.context_length}`)
+  return parts.join(' · ')
+}
+
 function statusLabel(s: string): string {
   if (s === 'pending') return 'Ожидание…'
   if (s === 'running') return 'Скачивание…'
@@ -65,6 +83,9 @@ export function ModelsPage({
   const [downloadStarted, setDownloadStarted] = useState<string | null>(null)
   const [tick, setTick] = useState(() => Date.now())
 
+  const jobsRef = useRef(jobs)
+  jobsRef.current = jobs
+
   const hasRunningJobs = useMemo(() => jobs.some((j) => j.status === 'pending' || j.status === 'running'), [jobs])
   const runningJobs = useMemo(
     () => jobs.filter((j) => j.status === 'pending' || j.status === 'running'),
@@ -81,14 +102,18 @@ export function ModelsPage({
   }, [jobs])
 
   async function refresh() {
-    const [m, j, loaded] = await Promise.all([
-      apiRequest<ModelOut[]>('/models', { token }),
-      apiRequest<ModelDownloadJobOut[]>('/models/jobs', { token }),
-      apiRequest<LoadedModelsResponse>('/models/loaded', { token }).catch(() => null),
-    ])
-    setModels(m)
-    setJobs(j)
-    setLoadedModels(loaded)
+    const items = await apiRequest<ModelLibraryItemOut[]>('/models/library', { token })
+    setModels(items)
+    setJobs(items.flatMap((m) => (m.latest_job ? [m.latest_job] : [])))
+    const loaded = items.filter((m) => m.loaded)
+    setLoadedModels(
+      items.some((m) => m.loaded !== null)
+        ? {
+            model_ids: loaded.map((m) => m.id),
+            models: loaded.map((m) => ({ id: m.id, hf_repo: m.hf_repo, hf_filename: m.hf_filename })),
+          }
+        : null
+    )
   }
 
   async function onLoad(modelId: number) {
@@ -174,6 +199,7 @@ export function ModelsPage({
           top_p: parseFloatOrNull('top_p'),
           top_k: parseIntOrNull('top_k'),
           repeat_penalty: parseFloatOrNull('repeat_penalty'),
+          num_ctx: parseIntOrNull('num_ctx'),
         }),
       })
       await refresh()
@@ -225,11 +251,53 @@ export function ModelsPage({
     auth.fetchMe().catch(() => {})
     refresh().catch(() => {})
     runHfSearch().catch(() => {})
-    const interval = hasRunningJobs ? 1000 : 3000
-    const t = setInterval(() => refresh().catch(() => {}), interval)
+    // Job progress is pushed over SSE below; this only catches model / Ollama changes.
+    const t = setInterval(() => refresh().catch(() => {}), 15000)
     return () => clearInterval(t)
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [hasRunningJobs])
+  }, [])
+
+  useEffect(() => {
+    const ctrl = new AbortController()
+    let retry: ReturnType<typeof setTimeout> | undefined
+    let pendingRefresh: ReturnType<typeof setTimeout> | undefined
+
+    function scheduleRefresh() {
+      if (pendingRefresh) return
+      pendingRefresh = setTimeout(() => {
+        pendingRefresh = undefined
+        refresh().catch(() => {})
+      }, 300)
+    }
+
+    async function listen() {
+      try {
+        const opts: RequestInit = { headers: { authorization: `Bearer ${token}` }, signal: ctrl.signal }
+        for await (const evt of fetchSse(`${API_BASE_URL}/models/jobs/stream`, opts)) {
+          if (evt.event !== 'job') continue
+          const upd = JSON.parse(evt.data) as Partial<ModelDownloadJobOut> & { id: number }
+          const known = jobsRef.current.find((j) => j.id === upd.id)
+          if (!known || (upd.status && upd.status !== known.status)) {
+            // New job or state change: model rows / timestamps changed too.
+            scheduleRefresh()
+          } else {
+            setJobs((prev) => prev.map((j) => (j.id === upd.id ? { ...j, ...upd } : j)))
+          }
+        }
+      } catch {
+        // reconnect below
+      }
+      if (!ctrl.signal.aborted) retry = setTimeout(listen, 3000)
+    }
+
+    listen()
+    return () => {
+      ctrl.abort()
+      clearTimeout(retry)
+      clearTimeout(pendingRefresh)
+    }
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [token])
 
   useEffect(() => {
     if (!hasRunningJobs) return
@@ -537,8 +605,15 @@ export function ModelsPage({
                 }}
               >
                 <div className="row" style={{ justifyContent: 'space-between' }}>
-                  <div style={{ fontWeight: 600 }}>
-                    {m.hf_repo} / {m.hf_filename}
+                  <div>
+                    <div style={{ fontWeight: 600 }}>
+                      {m.hf_repo} / {m.hf_filename}
+                    </div>
+                    {modelMetaLine(m) ? (
+                      <div className="muted" style={{ fontSize: 12 }}>
+                        {modelMetaLine(m)}
+                      </div>
+                    ) : null}
                   </div>
                   <div className="row" style={{ gap: 6, alignItems: 'center' }}>
                     {isLoaded ? (
@@ -632,6 +707,17 @@ export function ModelsPage({
                           defaultValue={m.default_repeat_penalty ?? ''}
                         />
                       </label>
+                      <label style={{ flex: '1 1 140px' }}>
+                        <span className="muted" style={{ fontSize: 12 }}>Context (num_ctx)</span>
+                        <input
+                          name="num_ctx"
+                          type="number"
+                          min={256}
+                          max={262144}
+                          step={256}
+                          defaultValue={m.default_num_ctx ?? ''}
+                        />
+                      </label>
                       <button
                         type="submit"
                         className="btn-ghost"
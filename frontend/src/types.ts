@@ -8,11 +8,17 @@ export type ModelOut = {
   hf_filename: string
   local_path: string | null
   size_bytes: number | null
+  sha256?: string | null
+  architecture?: string | null
+  context_length?: number | null
+  quantization?: string | null
+  parameter_count?: number | null
   default_temperature?: number | null
   default_max_tokens?: number | null
   default_top_p?: number | null
   default_top_k?: number | null
   default_repeat_penalty?: number | null
+  default_num_ctx?: number | null
   created_at: string
 }
 
@@ -33,6 +39,20 @@ export type ModelDownloadJobOut = {
   finished_at: string | null
 }
 
+export type ModelJobListOut = {
+  /** Newest first */
+  jobs: ModelDownloadJobOut[]
+  /** Pass as before_id to get the next (older) page */
+  next_cursor: number | null
+}
+
+/** GET /models/library: a model with its latest download job and Ollama state */
+export type ModelLibraryItemOut = ModelOut & {
+  latest_job: ModelDownloadJobOut | null
+  /** null when Ollama could not be asked */
+  loaded: boolean | null
+}
+
 export type HfModelSummary = {
   repo_id: string
   likes: number | null
@@ -58,12 +78,24 @@ export type MessageOut = {
   role: 'system' | 'user' | 'assistant' | string
   content: string
   tokens_used?: number | null
+  /** "streaming" / "failed" for unfinished assistant replies, null once complete */
+  status?: string | null
+  ttft_ms?: number | null
+  duration_ms?: number | null
   created_at: string
 }
 
+export type ChatListOut = {
+  chats: ChatOut[]
+  /** Pass as before_id to load the next (older) page */
+  next_cursor: number | null
+}
+
 export type ChatDetail = {
   chat: ChatOut
   messages: MessageOut[]
+  /** Pass as before_id to load older messages */
+  next_cursor: number | null
 }
 
 export type ModelParamsOut = {
@@ -72,6 +104,7 @@ export type ModelParamsOut = {
   top_p?: number | null
   top_k?: number | null
   repeat_penalty?: number | null
+  num_ctx?: number | null
   source?: string
 }
 